@@ -0,0 +1,287 @@
+# Vectorized batch simulator for Turbo Runners
+#
+# Runs many copies of one level side by side, with every per-entity field
+# stored as a NumPy array so a single step advances all environments at once.
+# The step reproduces Player.update and Game.update frame for frame: the same
+# float64 arithmetic, the same pygame.Rect rounding and the same update order.
+# Projectiles are not simulated since their hit test depends on the camera.
+# With fixed_point=True the player physics are integer kernels matching
+# Game(fixed_point=True).
+import numpy as np
+
+from main import (Game, SCREEN_WIDTH, SCREEN_HEIGHT, FPS, GRAVITY, JUMP_SPEED, PLAYER_SPEED,
+                  PLAYER_ACCELERATION, PLAYER_FRICTION, SIM_STEP, FIXED_SCALE,
+                  FIXED_GRAVITY, FIXED_JUMP_SPEED, FIXED_ACCELERATION, FIXED_FRICTION,
+                  rect_round, fixed_pixels, move_platforms, move_patrols)
+
+PLAYER_W = 40
+PLAYER_H = 60
+RUN_SPEED = PLAYER_SPEED * 1.8
+SPAWN_X = 50
+SPAWN_Y = 500
+
+# Input bits, matching InputState.to_bits
+LEFT, RIGHT, RUN, JUMP, ATTACK, SHOOT = 1, 2, 4, 8, 16, 32
+
+# Episode status
+RUNNING, GAME_OVER, RESCUED = 0, 1, 2
+
+_layouts = {}
+
+
+def overlaps(x, y, w, h, ox, oy, ow, oh):
+    # Same test as pygame.Rect.colliderect, broadcast over any shapes
+    return (x < ox + ow) & (ox < x + w) & (y < oy + oh) & (oy < y + h)
+
+
+class LevelLayout:
+    """Entity arrays for one level, taken from Game.create_level."""
+
+    def __init__(self, game):
+        # The batch step clamps to the screen and keeps every entity, so levels must fit one screen
+        if game.level_width > SCREEN_WIDTH:
+            raise ValueError("batch simulation only supports single-screen levels")
+
+        self.platforms = np.array([tuple(p.rect) for p in game.platforms], dtype=np.int64).reshape(-1, 4)
+
+        movers = game.moving_platforms
+        self.mover_rects = np.array([tuple(p.rect) for p in movers], dtype=np.int64).reshape(-1, 4)
+        self.mover_speed = np.array([p.speed for p in movers], dtype=np.float64)
+        self.mover_dir = np.array([p.direction for p in movers], dtype=np.float64)
+        self.mover_origin = np.array([p.original_x for p in movers], dtype=np.float64)
+        self.mover_range = np.array([p.range_limit for p in movers], dtype=np.float64)
+
+        obstacles = game.obstacles
+        self.obstacle_rects = np.array([tuple(o.rect) for o in obstacles], dtype=np.int64).reshape(-1, 4)
+        self.obstacle_patrol = np.array([o.type == "patrol" for o in obstacles], dtype=bool)
+        self.obstacle_speed = np.array([o.speed for o in obstacles], dtype=np.float64)
+        self.obstacle_origin = np.array([o.original_x for o in obstacles], dtype=np.int64)
+
+        self.coins = np.array([tuple(c.rect) for c in game.collectibles], dtype=np.int64).reshape(-1, 4)
+        self.power_ups = np.array([tuple(p.rect) for p in game.power_ups], dtype=np.int64).reshape(-1, 4)
+        self.power_up_jump = np.array([p.type == "jump" for p in game.power_ups], dtype=bool)
+
+        self.time_limit = game.time_limit
+
+        # Lord Zing's path is tabulated from his closed form so it matches LordZing.update exactly
+        zing = game.lord_zing
+        self.boss_rect = np.array(tuple(zing.rect), dtype=np.int64)
+        self.boss_health = zing.health
+        path = np.array([zing.position_at(f) for f in range(self.time_limit * FPS + 2)], dtype=np.int64)
+        self.boss_path_x = path[:, 0]
+        self.boss_path_y = path[:, 1]
+
+
+def level_layout(level):
+    if level not in _layouts:
+        game = Game(headless=True, seed=0)
+        game.start_level(level)
+        _layouts[level] = LevelLayout(game)
+    return _layouts[level]
+
+
+class BatchSimulator:
+    def __init__(self, level, num_envs, fixed_point=False):
+        self.level = level
+        self.num_envs = num_envs
+        self.layout = level_layout(level)
+
+        # Fixed-point velocities are integers in 1/FIXED_SCALE pixel units
+        self.fixed_point = fixed_point
+        if fixed_point:
+            self.walk_speed = round(PLAYER_SPEED * FIXED_SCALE)
+            self.run_speed = round(RUN_SPEED * FIXED_SCALE)
+            self.acceleration = FIXED_ACCELERATION
+            self.gravity = FIXED_GRAVITY
+            self.jump_speed = FIXED_JUMP_SPEED
+            velocity_type = np.int64
+        else:
+            self.walk_speed = PLAYER_SPEED
+            self.run_speed = RUN_SPEED
+            self.acceleration = PLAYER_ACCELERATION
+            self.gravity = GRAVITY
+            self.jump_speed = JUMP_SPEED
+            velocity_type = np.float64
+
+        n = num_envs
+        layout = self.layout
+        self.x = np.zeros(n, dtype=np.int64)
+        self.y = np.zeros(n, dtype=np.int64)
+        self.vel_x = np.zeros(n, dtype=velocity_type)
+        self.vel_y = np.zeros(n, dtype=velocity_type)
+        self.on_ground = np.zeros(n, dtype=bool)
+        self.lives = np.zeros(n, dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.frames = np.zeros(n, dtype=np.int64)
+        self.status = np.zeros(n, dtype=np.int8)
+
+        self.mover_x = np.zeros((n, len(layout.mover_rects)), dtype=np.int64)
+        self.mover_dir = np.zeros((n, len(layout.mover_rects)), dtype=np.float64)
+        self.obstacle_x = np.zeros((n, len(layout.obstacle_rects)), dtype=np.int64)
+        self.obstacle_dir = np.zeros((n, len(layout.obstacle_rects)), dtype=np.int64)
+        self.coins_collected = np.zeros((n, len(layout.coins)), dtype=bool)
+        self.power_ups_collected = np.zeros((n, len(layout.power_ups)), dtype=bool)
+
+        self.boss_x = np.zeros(n, dtype=np.int64)
+        self.boss_y = np.zeros(n, dtype=np.int64)
+        self.boss_frame = np.zeros(n, dtype=np.int64)
+        self.boss_health = np.zeros(n, dtype=np.int64)
+
+        self.reset()
+
+    @property
+    def done(self):
+        return self.status != RUNNING
+
+    def reset(self, mask=None):
+        if mask is None:
+            mask = np.ones(self.num_envs, dtype=bool)
+        layout = self.layout
+
+        self.x[mask] = SPAWN_X
+        self.y[mask] = SPAWN_Y
+        self.vel_x[mask] = 0
+        self.vel_y[mask] = 0
+        self.on_ground[mask] = False
+        self.lives[mask] = 3
+        self.score[mask] = 0
+        self.frames[mask] = 0
+        self.status[mask] = RUNNING
+
+        self.mover_x[mask] = layout.mover_rects[:, 0]
+        self.mover_dir[mask] = layout.mover_dir
+        self.obstacle_x[mask] = layout.obstacle_rects[:, 0]
+        self.obstacle_dir[mask] = 1
+        self.coins_collected[mask] = False
+        self.power_ups_collected[mask] = False
+
+        self.boss_x[mask] = layout.boss_rect[0]
+        self.boss_y[mask] = layout.boss_rect[1]
+        self.boss_frame[mask] = 0
+        self.boss_health[mask] = layout.boss_health
+
+    def step(self, actions):
+        """Advance every running environment by one frame.
+
+        actions holds one InputState bit mask per environment.
+        """
+        layout = self.layout
+        actions = np.asarray(actions, dtype=np.int64)
+        active = self.status == RUNNING
+        rescued = np.zeros(self.num_envs, dtype=bool)
+
+        # Game.apply_actions
+        jump = active & ((actions & JUMP) != 0) & self.on_ground
+        self.vel_y[jump] = self.jump_speed
+
+        boss_centerx = self.boss_x + layout.boss_rect[2] // 2
+        attack = active & ((actions & ATTACK) != 0) & (np.abs(self.x + PLAYER_W // 2 - boss_centerx) < 100)
+        self.boss_health -= attack
+        rescued |= attack & (self.boss_health <= 0)
+
+        self.frames += active
+
+        # Player.update
+        speed = np.where((actions & RUN) != 0, self.run_speed, self.walk_speed)
+        left = (actions & LEFT) != 0
+        right = ~left & ((actions & RIGHT) != 0)
+        if self.fixed_point:
+            # Truncated toward zero, as fixed_friction does
+            slowed = np.sign(self.vel_x) * (np.abs(self.vel_x) * FIXED_FRICTION // FIXED_SCALE)
+        else:
+            slowed = self.vel_x * PLAYER_FRICTION
+        vel_x = np.where(left, np.maximum(self.vel_x - self.acceleration, -speed),
+                         np.where(right, np.minimum(self.vel_x + self.acceleration, speed), slowed))
+        self.vel_x = np.where(active, vel_x, self.vel_x)
+        self.x = np.where(active, self._move(self.x, self.vel_x), self.x)
+
+        self.vel_y = np.where(active, self.vel_y + self.gravity, self.vel_y)
+        self.y = np.where(active, self._move(self.y, self.vel_y), self.y)
+
+        # Static platforms come first, then moving ones, as in the platform list
+        plat_x = np.concatenate([np.broadcast_to(layout.platforms[:, 0], (self.num_envs, len(layout.platforms))),
+                                 self.mover_x], axis=1)
+        plat_y = np.concatenate([layout.platforms[:, 1], layout.mover_rects[:, 1]])
+        plat_w = np.concatenate([layout.platforms[:, 2], layout.mover_rects[:, 2]])
+        plat_h = np.concatenate([layout.platforms[:, 3], layout.mover_rects[:, 3]])
+        hits = overlaps(self.x[:, None], self.y[:, None], PLAYER_W, PLAYER_H, plat_x, plat_y, plat_w, plat_h)
+        landed = active & (self.vel_y > 0) & hits.any(axis=1)
+        first = hits.argmax(axis=1)
+        self.y = np.where(landed, plat_y[first] - PLAYER_H, self.y)
+        self.vel_y[landed] = 0
+        self.on_ground = np.where(active, landed, self.on_ground)
+
+        clamp_left = active & (self.x < 0)
+        self.x[clamp_left] = 0
+        self.vel_x[clamp_left] = 0
+        clamp_right = active & (self.x + PLAYER_W > SCREEN_WIDTH)
+        self.x[clamp_right] = SCREEN_WIDTH - PLAYER_W
+        self.vel_x[clamp_right] = 0
+
+        fell = active & (self.y > SCREEN_HEIGHT)
+        self.lives -= fell
+        self._respawn(fell)
+
+        # MovingPlatform.update
+        moved, direction = move_platforms(self.mover_x, self.mover_dir, layout.mover_speed,
+                                          layout.mover_origin, layout.mover_range)
+        self.mover_x = np.where(active[:, None], moved, self.mover_x)
+        self.mover_dir = np.where(active[:, None], direction, self.mover_dir)
+
+        # MovingObstacle.update
+        patrol = active[:, None] & layout.obstacle_patrol
+        patrol_x, direction = move_patrols(self.obstacle_x, self.obstacle_dir, layout.obstacle_speed,
+                                           layout.obstacle_origin)
+        self.obstacle_x = np.where(patrol, patrol_x, self.obstacle_x)
+        self.obstacle_dir = np.where(patrol, direction, self.obstacle_dir)
+
+        # LordZing.update
+        alive = active & (self.boss_health > 0)
+        self.boss_frame += alive
+        path_index = np.minimum(self.boss_frame, len(layout.boss_path_x) - 1)
+        self.boss_x = np.where(alive, layout.boss_path_x[path_index], self.boss_x)
+        self.boss_y = np.where(alive, layout.boss_path_y[path_index], self.boss_y)
+
+        # Obstacle hits are resolved in list order since a hit respawns the player
+        game_over = np.zeros(self.num_envs, dtype=bool)
+        obstacle_y, obstacle_w, obstacle_h = layout.obstacle_rects[:, 1:].T
+        for j in range(len(layout.obstacle_rects)):
+            hit = active & overlaps(self.x, self.y, PLAYER_W, PLAYER_H,
+                                    self.obstacle_x[:, j], obstacle_y[j], obstacle_w[j], obstacle_h[j])
+            self.lives -= hit
+            game_over |= hit & (self.lives <= 0)
+            self._respawn(hit & (self.lives > 0))
+
+        # Collectibles and power-ups
+        coins = layout.coins
+        grabbed = (active[:, None] & ~self.coins_collected &
+                   overlaps(self.x[:, None], self.y[:, None], PLAYER_W, PLAYER_H,
+                            coins[:, 0], coins[:, 1], coins[:, 2], coins[:, 3]))
+        self.coins_collected |= grabbed
+        self.score += 100 * grabbed.sum(axis=1)
+
+        power_ups = layout.power_ups
+        grabbed = (active[:, None] & ~self.power_ups_collected &
+                   overlaps(self.x[:, None], self.y[:, None], PLAYER_W, PLAYER_H,
+                            power_ups[:, 0], power_ups[:, 1], power_ups[:, 2], power_ups[:, 3]))
+        self.power_ups_collected |= grabbed
+        self.score += 200 * grabbed.sum(axis=1)
+        boost = (grabbed & layout.power_up_jump).any(axis=1) & self.on_ground
+        self.vel_y[boost] = self.jump_speed
+
+        # Level end
+        timed_out = active & ~rescued & (self.frames * SIM_STEP > layout.time_limit)
+        self.lives[timed_out] = 0
+        self.status[rescued] = RESCUED
+        self.status[game_over | timed_out] = GAME_OVER
+
+    def _move(self, position, velocity):
+        if self.fixed_point:
+            return position + fixed_pixels(velocity)
+        return rect_round(position + velocity)
+
+    def _respawn(self, mask):
+        self.x[mask] = SPAWN_X
+        self.y[mask] = SPAWN_Y
+        self.vel_x[mask] = 0
+        self.vel_y[mask] = 0
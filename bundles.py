@@ -0,0 +1,259 @@
+# Compiled level bundles for Turbo Runners
+#
+# compile_level() packs a level into one binary file: each kind of entity
+# as a fixed-size record array, the chunk index LevelStream streams from,
+# and the level's reachability. load_bundle() maps the file into memory and
+# reads it in place, so opening a level costs the same for ten entities or
+# a million, and only the chunks near the player are ever decoded.
+#
+#     python bundles.py [level files...]
+#
+# compiles the given files (all of levels/ by default) to .bundle files
+# beside them. Game(level_source=BundleFiles()) plays the compiled levels.
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+import numpy as np
+
+from levels import LEVEL_DIR, OBSTACLE_TYPES, POWER_UP_TYPES, level_count, level_path, load_level
+from main import CHUNK_WIDTH, LevelStream, chunk_members
+from reachability import analyze, level_hash
+
+MAGIC = b"TRLB"
+VERSION = 2
+# Magic, version, flags, chunk width, level width, time limit, Lord Zing
+# (x, y), friend (x, y), level hash, then the offset and count of each section
+HEADER = struct.Struct("<4sBBxxIId4i20s")
+SECTIONS = ("name", "platforms", "moving_platforms", "obstacles", "collectibles", "power_ups",
+            "chunk_starts", "chunk_members", "reached")
+SECTION = struct.Struct("<QQ")
+# Sections start on a multiple of this, so every record array is aligned
+ALIGN = 8
+
+BOSS_REACHABLE = 1
+FRIEND_REACHABLE = 2
+
+RECORDS = {
+    "name": np.dtype("u1"),
+    "platforms": np.dtype([("x", "<i4"), ("y", "<i4"), ("width", "<i4"), ("height", "<i4")]),
+    "moving_platforms": np.dtype([("x", "<i4"), ("y", "<i4"), ("width", "<i4"), ("height", "<i4"),
+                                  ("speed", "<f8"), ("direction", "<f8"), ("range_limit", "<f8")]),
+    "obstacles": np.dtype([("x", "<i4"), ("y", "<i4"), ("width", "<i4"), ("height", "<i4"),
+                           ("type", "u1"), ("speed", "<f8")]),
+    "collectibles": np.dtype([("x", "<i4"), ("y", "<i4")]),
+    "power_ups": np.dtype([("x", "<i4"), ("y", "<i4"), ("type", "u1")]),
+    # Chunk c holds members chunk_starts[c]:chunk_starts[c + 1]
+    "chunk_starts": np.dtype("<u4"),
+    "chunk_members": np.dtype([("kind", "u1"), ("index", "<u4")]),
+    # One flag per platform, then per moving platform
+    "reached": np.dtype("u1"),
+}
+
+# Enumerated fields, stored as their index in these tuples
+CHOICES = {
+    "obstacles": (4, OBSTACLE_TYPES),
+    "power_ups": (2, POWER_UP_TYPES),
+}
+
+_cache = {}
+
+
+def bundle_path(number):
+    return os.path.join(LEVEL_DIR, f"level{number}.bundle")
+
+
+def compile_level(description, path):
+    """Write a LevelDescription to path as a bundle."""
+    reachability = analyze(description)
+    flags = (BOSS_REACHABLE if reachability.boss else 0) | (FRIEND_REACHABLE if reachability.friend else 0)
+
+    chunks = chunk_members(description)
+    members = [member for chunk in chunks for member in chunk]
+    starts = np.cumsum([0] + [len(chunk) for chunk in chunks])
+    sections = {
+        "name": np.frombuffer(description.name.encode(), dtype=RECORDS["name"]),
+        "chunk_starts": np.array(starts, dtype=RECORDS["chunk_starts"]),
+        "chunk_members": np.array([(LevelStream.KINDS.index(kind), index) for kind, index in members],
+                                  dtype=RECORDS["chunk_members"]),
+        "reached": np.array([i in reachability.reached for i in range(len(reachability.surfaces))],
+                            dtype=RECORDS["reached"]),
+    }
+    for kind in LevelStream.KINDS:
+        entries = getattr(description, kind)
+        if kind in CHOICES:
+            field, choices = CHOICES[kind]
+            entries = [entry[:field] + (choices.index(entry[field]),) + entry[field + 1:] for entry in entries]
+        sections[kind] = np.array(list(entries), dtype=RECORDS[kind])
+
+    offset = _aligned(HEADER.size + SECTION.size * len(SECTIONS))
+    table = []
+    for name in SECTIONS:
+        table.append((offset, len(sections[name])))
+        offset = _aligned(offset + sections[name].nbytes)
+
+    header = HEADER.pack(MAGIC, VERSION, flags, CHUNK_WIDTH, description.width, description.time_limit,
+                         *description.lord_zing, *description.friend, bytes.fromhex(level_hash(description)))
+    # A bundle that is already mapped must never be truncated under its
+    # reader, so the new one is written beside it and renamed over it
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, temporary = tempfile.mkstemp(prefix=name + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(header)
+            for entry in table:
+                f.write(SECTION.pack(*entry))
+            for section, (start, _) in zip(SECTIONS, table):
+                f.write(b"\0" * (start - f.tell()))
+                f.write(sections[section].tobytes())
+            f.write(b"\0" * (offset - f.tell()))
+        # mkstemp makes the file private; bundles are as readable as level files
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def _aligned(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+
+class Records:
+    """Read-only sequence of entity parameter tuples over a record array.
+
+    Entries are decoded only when asked for, into the same tuples a
+    LevelDescription holds.
+    """
+
+    def __init__(self, array, choice=None):
+        self.array = array
+        self.choice = choice
+
+    def __len__(self):
+        return len(self.array)
+
+    def __getitem__(self, index):
+        params = tuple(map(_number, self.array[index].tolist()))
+        if self.choice:
+            field, choices = self.choice
+            params = params[:field] + (choices[params[field]],) + params[field + 1:]
+        return params
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+
+class ChunkMembers:
+    """LevelStream's chunk index, read from a bundle a chunk at a time."""
+
+    def __init__(self, starts, members):
+        self.starts = starts
+        self.members = members
+
+    def __len__(self):
+        return len(self.starts) - 1
+
+    def __getitem__(self, chunk):
+        members = self.members[self.starts[chunk]:self.starts[chunk + 1]]
+        return list(zip(map(LevelStream.KINDS.__getitem__, members["kind"].tolist()), members["index"].tolist()))
+
+
+class LevelBundle:
+    """A compiled level, read in place from a memory-mapped bundle.
+
+    It has the attributes of a LevelDescription, plus chunk_members for
+    LevelStream and the reachability worked out when it was compiled.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.map) < HEADER.size + SECTION.size * len(SECTIONS):
+            raise ValueError(f"{path} is too short to be a level bundle")
+        (magic, version, flags, chunk_width, self.width, time_limit, zing_x, zing_y,
+         friend_x, friend_y, digest) = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a level bundle")
+        if version != VERSION:
+            raise ValueError(f"{path}: unsupported bundle version {version}")
+
+        self.time_limit = _number(time_limit)
+        self.lord_zing = (zing_x, zing_y)
+        self.friend = (friend_x, friend_y)
+        self.level_hash = digest.hex()
+        self.boss_reachable = bool(flags & BOSS_REACHABLE)
+        self.friend_reachable = bool(flags & FRIEND_REACHABLE)
+
+        sections = {}
+        for i, name in enumerate(SECTIONS):
+            offset, count = SECTION.unpack_from(self.map, HEADER.size + i * SECTION.size)
+            if offset + count * RECORDS[name].itemsize > len(self.map):
+                raise ValueError(f"{path}: {name} runs past the end of the file")
+            sections[name] = np.frombuffer(self.map, dtype=RECORDS[name], count=count, offset=offset)
+
+        self.name = sections["name"].tobytes().decode()
+        for kind in LevelStream.KINDS:
+            setattr(self, kind, Records(sections[kind], CHOICES.get(kind)))
+        self.reached = sections["reached"]
+        # The index is only valid for the chunk width it was built with
+        self.chunk_members = None
+        if chunk_width == CHUNK_WIDTH:
+            self.chunk_members = ChunkMembers(sections["chunk_starts"], sections["chunk_members"])
+
+    @property
+    def completable(self):
+        return self.boss_reachable and self.friend_reachable
+
+
+def _number(value):
+    # Whole numbers come back as ints, as the level file wrote them
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def load_bundle(path):
+    """LevelBundle for a bundle file, cached until the file changes.
+
+    Raises ValueError if the file is not a valid bundle.
+    """
+    path = os.path.abspath(path)
+    mtime = os.stat(path).st_mtime_ns
+    cached = _cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    bundle = LevelBundle(path)
+    _cache[path] = (mtime, bundle)
+    return bundle
+
+
+class BundleFiles:
+    """The numbered compiled levels, as the source Game loads levels from."""
+
+    @property
+    def count(self):
+        count = 0
+        while os.path.exists(bundle_path(count + 1)):
+            count += 1
+        return count
+
+    def load(self, number):
+        return load_bundle(bundle_path(number))
+
+
+def main(argv):
+    paths = argv or [level_path(number) for number in range(1, level_count() + 1)]
+    for path in paths:
+        description = load_level(path)
+        target = os.path.splitext(path)[0] + ".bundle"
+        compile_level(description, target)
+        status = "" if analyze(description).completable else " (not completable)"
+        print(f"{path} -> {target}{status}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
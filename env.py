@@ -0,0 +1,184 @@
+# Gym-style environment API for Turbo Runners
+#
+# TurboRunnersEnv wraps a headless Game with reset/step/observation.
+# VectorEnv shards many environments across worker processes. Actions,
+# observations, rewards and done flags live in shared memory, so a step
+# only sends a short command message to each worker.
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from main import Game, InputState
+
+NEAREST_PLATFORMS = 5
+NEAREST_OBSTACLES = 3
+NEAREST_COINS = 3
+RESCUE_REWARD = 1000
+
+# Player rect (4), velocities (2), lives, score, boss offset and health (3),
+# then (dx, dy, width, height) for each nearby entity slot
+OBS_SIZE = 4 + 2 + 2 + 3 + 4 * (NEAREST_PLATFORMS + NEAREST_OBSTACLES + NEAREST_COINS)
+
+
+class TurboRunnersEnv:
+    def __init__(self, seed=None):
+        self.game = Game(headless=True, seed=seed)
+        self.level = 1
+        self.seed = seed
+
+    def reset(self, level=1):
+        self.level = level
+        self.game.start_level(level, self.seed)
+        return self.observation()
+
+    def step(self, action):
+        """Advance one frame. action is an InputState or its bit mask.
+
+        Returns (observation, reward, done, info). The episode ends when the
+        player rescues the friend or the game is over.
+        """
+        if not isinstance(action, InputState):
+            action = InputState.from_bits(int(action))
+
+        game = self.game
+        score = game.player.score
+        game.step(action)
+
+        rescued = game.current_level != self.level or game.state == "victory"
+        done = rescued or game.state != "game"
+        reward = game.player.score - score
+        if rescued:
+            reward += RESCUE_REWARD
+
+        info = {"state": game.state, "rescued": rescued, "frames": game.level_frames}
+        return self.observation(), reward, done, info
+
+    def observation(self, out=None):
+        if out is None:
+            out = np.zeros(OBS_SIZE, dtype=np.float32)
+        else:
+            out[:] = 0
+
+        game = self.game
+        player = game.player
+        out[0:4] = tuple(player.rect)
+        out[4:6] = player.velocity()
+        out[6] = player.lives
+        out[7] = player.score
+
+        zing = game.lord_zing
+        if zing and not zing.defeated:
+            out[8] = zing.rect.centerx - player.rect.centerx
+            out[9] = zing.rect.centery - player.rect.centery
+            out[10] = zing.health
+
+        index = 11
+        platforms = game.platforms + game.moving_platforms
+        coins = [c for c in game.collectibles if not c.collected]
+        for entities, count in ((platforms, NEAREST_PLATFORMS),
+                                (game.obstacles, NEAREST_OBSTACLES),
+                                (coins, NEAREST_COINS)):
+            nearest = sorted(entities, key=lambda e: abs(e.rect.centerx - player.rect.centerx))
+            for entity in nearest[:count]:
+                out[index:index + 4] = (entity.rect.x - player.rect.x, entity.rect.y - player.rect.y,
+                                        entity.rect.width, entity.rect.height)
+                index += 4
+            index += 4 * (count - len(nearest[:count]))
+        return out
+
+
+def _worker(conn, shm_names, num_envs, start, stop, seed):
+    buffers = [shared_memory.SharedMemory(name=name) for name in shm_names]
+    obs, actions, rewards, dones = _views(buffers, num_envs)
+
+    envs = [TurboRunnersEnv(None if seed is None else seed + i) for i in range(start, stop)]
+    levels = [1] * len(envs)
+    try:
+        while True:
+            command, data = conn.recv()
+            if command == "reset":
+                levels = data[start:stop]
+                for i, env in enumerate(envs):
+                    env.reset(levels[i])
+                    env.observation(obs[start + i])
+            elif command == "step":
+                for i, env in enumerate(envs):
+                    _, reward, done, _ = env.step(actions[start + i])
+                    rewards[start + i] = reward
+                    dones[start + i] = done
+                    # Finished environments restart their level straight away
+                    if done:
+                        env.reset(levels[i])
+                    env.observation(obs[start + i])
+            elif command == "close":
+                break
+            conn.send(True)
+    finally:
+        del obs, actions, rewards, dones
+        for buffer in buffers:
+            buffer.close()
+        conn.close()
+
+
+def _views(buffers, num_envs):
+    obs = np.ndarray((num_envs, OBS_SIZE), dtype=np.float32, buffer=buffers[0].buf)
+    actions = np.ndarray(num_envs, dtype=np.uint8, buffer=buffers[1].buf)
+    rewards = np.ndarray(num_envs, dtype=np.float32, buffer=buffers[2].buf)
+    dones = np.ndarray(num_envs, dtype=bool, buffer=buffers[3].buf)
+    return obs, actions, rewards, dones
+
+
+class VectorEnv:
+    """Runs num_envs environments split across worker processes.
+
+    step() and reset() return views into shared memory that are overwritten
+    by the next call, so copy them if they need to be kept.
+    """
+
+    def __init__(self, num_envs, num_workers=None, seed=None):
+        self.num_envs = num_envs
+        num_workers = min(num_workers or mp.cpu_count(), num_envs)
+
+        sizes = (num_envs * OBS_SIZE * 4, num_envs, num_envs * 4, num_envs)
+        self.buffers = [shared_memory.SharedMemory(create=True, size=size) for size in sizes]
+        self.obs, self.actions, self.rewards, self.dones = _views(self.buffers, num_envs)
+
+        self.connections = []
+        self.workers = []
+        bounds = np.linspace(0, num_envs, num_workers + 1).astype(int)
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            parent, child = mp.Pipe()
+            worker = mp.Process(target=_worker, daemon=True,
+                                args=(child, [b.name for b in self.buffers], num_envs,
+                                      start, stop, seed))
+            worker.start()
+            child.close()
+            self.connections.append(parent)
+            self.workers.append(worker)
+
+    def _broadcast(self, command, data=None):
+        for conn in self.connections:
+            conn.send((command, data))
+        for conn in self.connections:
+            conn.recv()
+
+    def reset(self, level=1):
+        levels = list(level) if hasattr(level, "__len__") else [level] * self.num_envs
+        self._broadcast("reset", levels)
+        return self.obs
+
+    def step(self, actions):
+        self.actions[:] = actions
+        self._broadcast("step")
+        return self.obs, self.rewards, self.dones
+
+    def close(self):
+        for conn in self.connections:
+            conn.send(("close", None))
+        for worker in self.workers:
+            worker.join()
+        del self.obs, self.actions, self.rewards, self.dones
+        for buffer in self.buffers:
+            buffer.close()
+            buffer.unlink()
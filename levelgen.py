@@ -0,0 +1,228 @@
+# Procedural levels for Turbo Runners
+#
+# generate_level(seed) builds a LevelDescription from a seed: ground broken
+# by pits, staircases of floating platforms, moving platforms, patrols,
+# spikes, coins, power-ups, and Lord Zing and the friend on the last stretch
+# of ground. Every pit and step on the way is sized against the jump arc
+# simulated from JUMP_SPEED, GRAVITY and PLAYER_SPEED, so the level can
+# always be finished. The same seed always gives the same level.
+import math
+import random
+
+from levels import LevelDescription
+from main import PATROL_RANGE, PLAYER_SPEED, SCREEN_HEIGHT, SCREEN_WIDTH
+from reachability import jump_arc
+
+GROUND_Y = SCREEN_HEIGHT - 50
+PLAYER_HEIGHT = 60
+# Share of the simulated jump reach a generated gap may use
+REACH_MARGIN = 0.85
+# Pixels of the jump height a generated step leaves spare
+RISE_MARGIN = 25
+# Floating platforms stay this far below the top of the screen
+CEILING = 100
+SEGMENT_MIN = 300
+SEGMENT_MAX = 800
+PIT_MIN = 60
+# The last stretch of ground holds Lord Zing and the friend
+FINAL_SEGMENT = 500
+TIME_PER_SCREEN = 90
+
+
+# Generated gaps are sized for a walking jump from a standstill
+ARC = jump_arc(PLAYER_SPEED)
+MAX_RISE = max(rise for _, rise, _ in ARC)
+
+
+def _reach_table():
+    # Horizontal distance covered by the frame the player's feet drop below
+    # each reachable rise, indexed by rise + SCREEN_HEIGHT
+    apex = max(range(len(ARC)), key=lambda t: ARC[t][1])
+    table = []
+    t = apex
+    for rise in range(MAX_RISE, -SCREEN_HEIGHT - 1, -1):
+        while t < len(ARC) - 1 and ARC[t][1] >= rise:
+            t += 1
+        table.append(ARC[t][0])
+    table.reverse()
+    return table
+
+
+_REACH = _reach_table()
+
+
+def max_gap(rise):
+    """Widest gap between platform edges that a jump up by `rise` pixels can
+    clear, or 0 if the rise is out of reach. Negative rises drop down."""
+    if rise > MAX_RISE - RISE_MARGIN:
+        return 0
+    return int(_REACH[max(rise, -SCREEN_HEIGHT) + SCREEN_HEIGHT] * REACH_MARGIN)
+
+
+def generate_level(seed, screens=1):
+    """A playable level `screens` screens wide, the same for every call with `seed`."""
+    return LevelDescription(level_data(seed, screens), f"generated level {seed}")
+
+
+def level_data(seed, screens=1):
+    """The generated level as the dict a level file holds, ready for json.dump."""
+    rng = random.Random(seed)
+    width = screens * SCREEN_WIDTH
+    level = {
+        "name": f"Generated {seed}",
+        "time_limit": TIME_PER_SCREEN * screens,
+        "width": width,
+        "platforms": [],
+        "moving_platforms": [],
+        "obstacles": [],
+        "collectibles": [],
+        "power_ups": [],
+    }
+    platforms = level["platforms"]
+    coins = level["collectibles"]
+
+    # Ground segments, split by pits the player can jump from a standstill
+    segments = []
+    x = 0
+    pit_max = max_gap(0)
+    while True:
+        length = rng.randint(SEGMENT_MIN, SEGMENT_MAX)
+        if x + length + PIT_MIN + FINAL_SEGMENT > width:
+            length = width - x
+        segments.append((x, length))
+        platforms.append({"x": x, "y": GROUND_Y, "width": length, "height": 50})
+        x += length
+        if x >= width:
+            break
+        pit = rng.randint(PIT_MIN, min(pit_max, width - x - FINAL_SEGMENT))
+        _pit(rng, level, x, pit)
+        x += pit
+
+    for i, (left, length) in enumerate(segments):
+        right = left + length
+        # Nothing dangerous near the spawn point; the last segment is the boss's
+        hazards = 0 < i < len(segments) - 1
+        if i == len(segments) - 1:
+            right -= FINAL_SEGMENT // 2
+
+        for x in range(left + 40, right - 40, rng.randint(60, 120)):
+            if rng.random() < 0.3:
+                coins.append({"x": x, "y": GROUND_Y - 45})
+
+        feature = rng.random()
+        if feature < 0.5:
+            _stairs(rng, level, left, right)
+        elif feature < 0.7 and hazards:
+            _spikes(rng, level, left, right)
+        elif feature < 0.85:
+            _floating_mover(rng, level, left, right)
+        if hazards and length >= 2 * (PATROL_RANGE + 40) + 35 and rng.random() < 0.6:
+            _patrol(rng, level, left, length)
+
+    # Lord Zing sways 100 pixels either side of where he starts
+    zing_x = width - rng.randint(280, 380)
+    zing_y = rng.randint(80, 280)
+    level["lord_zing"] = {"x": zing_x, "y": zing_y}
+    # The friend waits on a ledge a jump above the ground
+    friend_x = min(zing_x + rng.randint(50, 120), width - 60)
+    ledge_y = GROUND_Y - rng.randint(PLAYER_HEIGHT + 20, MAX_RISE - RISE_MARGIN)
+    platforms.append({"x": friend_x - 10, "y": ledge_y, "width": 55, "height": 15})
+    level["friend"] = {"x": friend_x, "y": ledge_y - 55}
+    if rng.random() < 0.5:
+        level["power_ups"].append({"x": zing_x - rng.randint(150, 250), "y": GROUND_Y - 50, "type": "attack"})
+    return level
+
+
+def _pit(rng, level, x, pit):
+    # A coin over the middle of the pit, and sometimes a platform ferrying across
+    level["collectibles"].append({"x": x + pit // 2 - 12, "y": GROUND_Y - PLAYER_HEIGHT - rng.randint(20, 60)})
+    mover_width = rng.randint(60, 100)
+    travel = (pit - mover_width) // 2
+    if travel >= 20 and rng.random() < 0.4:
+        level["moving_platforms"].append({
+            "x": x + travel, "y": GROUND_Y, "width": mover_width, "height": 15,
+            "speed": rng.choice((1, 1.5, 2, 2.5)), "direction": rng.choice((-1, 1)),
+            "range_limit": travel,
+        })
+
+
+def _stairs(rng, level, left, right):
+    # Floating platforms climbing from the ground, each a jump from the last
+    x = left + rng.randint(40, 200)
+    top = GROUND_Y
+    steps = []
+    for step in range(rng.randint(1, 5)):
+        # The first step clears the head of a player walking under it
+        rise = rng.randint(PLAYER_HEIGHT + 20 if step == 0 else 40, MAX_RISE - RISE_MARGIN)
+        width = rng.randint(60, 160)
+        if top - rise < CEILING or x + width > right:
+            break
+        top -= rise
+        steps.append({"x": x, "y": top, "width": width, "height": 15})
+        level["collectibles"].append({"x": x + width // 2 - 12, "y": top - 45})
+        x += width + rng.randint(0, max_gap(rise))
+    if not steps:
+        return
+    level["platforms"].extend(steps)
+    if rng.random() < 0.4:
+        step = steps[-1]
+        level["power_ups"].append({"x": step["x"] + step["width"] // 2 - 15, "y": step["y"] - 50,
+                                   "type": rng.choice(("speed", "jump", "attack"))})
+
+
+def _spikes(rng, level, left, right):
+    # Spikes hang clear of a walking player's head, away from the segment's
+    # edges so jumping a pit never meets them
+    clearance = max_gap(0)
+    if right - left < 2 * clearance + 30:
+        return
+    x = rng.randint(left + clearance, right - clearance - 30)
+    y = GROUND_Y - PLAYER_HEIGHT - 30 - rng.randint(20, 60)
+    level["obstacles"].append({"x": x, "y": y, "width": 30, "height": 30, "type": "floating"})
+
+
+def _floating_mover(rng, level, left, right):
+    # A moving platform within a jump of the ground, with a coin riding above it
+    width = rng.randint(60, 120)
+    travel = rng.randint(40, 150)
+    if right - left < width + 2 * travel:
+        return
+    x = rng.randint(left + travel, right - travel - width)
+    y = GROUND_Y - rng.randint(PLAYER_HEIGHT + 20, MAX_RISE - RISE_MARGIN)
+    level["moving_platforms"].append({
+        "x": x, "y": y, "width": width, "height": 15,
+        "speed": rng.choice((1, 1.5, 2, 2.5, 3)), "direction": rng.choice((-1, 1)), "range_limit": travel,
+    })
+    level["collectibles"].append({"x": x + width // 2 - 12, "y": y - 45})
+
+
+def _patrol(rng, level, left, length):
+    # Patrols walk PATROL_RANGE either way of the segment's middle
+    x = left + length // 2 - 17
+    level["obstacles"].append({"x": x, "y": GROUND_Y - 40, "width": 35, "height": 35,
+                               "type": "patrol", "speed": rng.choice((1, 1.5, 2, 2.5, 3))})
+
+
+class EndlessLevels:
+    """Level source for Game that never runs out: level n is generated from seed + n.
+
+    Game(level_source=EndlessLevels(seed)) moves on to a new level after
+    every rescue. The current level is kept, so restarting it doesn't
+    generate it again. Replays store the seed and screen count, so they
+    play back on the same levels.
+    """
+
+    count = math.inf
+
+    def __init__(self, seed=0, screens=1):
+        self.seed = seed
+        self.screens = screens
+        self.cache = {}
+
+    def load(self, number):
+        level = self.cache.get(number)
+        if level is None:
+            # Only the current level is ever restarted
+            self.cache.clear()
+            level = self.cache[number] = generate_level(self.seed + number, self.screens)
+        return level
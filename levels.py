@@ -0,0 +1,161 @@
+# Level files for Turbo Runners
+#
+# Each level is a JSON file in levels/ listing its platforms, moving
+# platforms, obstacles, coins, power-ups, Lord Zing and the friend, with an
+# optional width for levels that scroll past the first screen.
+# load_level() validates a file and caches the parsed description by path
+# and modification time, so restarting a level never parses it again and
+# an edited file is picked up on the next load.
+import json
+import os
+
+LEVEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels")
+
+OBSTACLE_TYPES = ("patrol", "floating")
+POWER_UP_TYPES = ("speed", "jump", "attack")
+
+_cache = {}
+
+
+class LevelDescription:
+    """A validated level, with every entity's parameters stored as tuples."""
+
+    def __init__(self, data, where):
+        self.name = _string(data, "name", where, default="")
+        self.time_limit = _number(data, "time_limit", where, positive=True)
+
+        self.platforms = tuple(
+            _rect(entry, f"{where}: platforms[{i}]")
+            for i, entry in enumerate(_entries(data, "platforms", where, required=True)))
+        if not self.platforms:
+            raise ValueError(f"{where}: a level needs at least one platform")
+
+        # Levels are as wide as their platforms reach unless they say otherwise
+        default_width = max(x + width for x, _, width, _ in self.platforms)
+        self.width = _number(data, "width", where, default=default_width, positive=True, integer=True)
+
+        self.moving_platforms = tuple(
+            _rect(entry, f"{where}: moving_platforms[{i}]") + (
+                _number(entry, "speed", f"{where}: moving_platforms[{i}]", default=2),
+                _number(entry, "direction", f"{where}: moving_platforms[{i}]", default=1),
+                _number(entry, "range_limit", f"{where}: moving_platforms[{i}]", default=150))
+            for i, entry in enumerate(_entries(data, "moving_platforms", where)))
+
+        self.obstacles = tuple(
+            _rect(entry, f"{where}: obstacles[{i}]") + (
+                _choice(entry, "type", OBSTACLE_TYPES, f"{where}: obstacles[{i}]", default="patrol"),
+                _number(entry, "speed", f"{where}: obstacles[{i}]", default=2))
+            for i, entry in enumerate(_entries(data, "obstacles", where)))
+
+        self.collectibles = tuple(
+            _point(entry, f"{where}: collectibles[{i}]")
+            for i, entry in enumerate(_entries(data, "collectibles", where)))
+
+        self.power_ups = tuple(
+            _point(entry, f"{where}: power_ups[{i}]") + (
+                _choice(entry, "type", POWER_UP_TYPES, f"{where}: power_ups[{i}]", default="speed"),)
+            for i, entry in enumerate(_entries(data, "power_ups", where)))
+
+        self.lord_zing = _point(_object(data, "lord_zing", where), f"{where}: lord_zing")
+        self.friend = _point(_object(data, "friend", where), f"{where}: friend")
+
+
+def level_path(number):
+    return os.path.join(LEVEL_DIR, f"level{number}.json")
+
+
+def level_count():
+    # Levels are numbered from 1 with no gaps
+    count = 0
+    while os.path.exists(level_path(count + 1)):
+        count += 1
+    return count
+
+
+class LevelFiles:
+    """The numbered level files, as the source Game loads levels from."""
+
+    @property
+    def count(self):
+        return level_count()
+
+    def load(self, number):
+        return load_level(level_path(number))
+
+
+def load_level(path):
+    """Parsed LevelDescription for a level file, cached until the file changes.
+
+    Raises ValueError if the file is not a valid level.
+    """
+    path = os.path.abspath(path)
+    mtime = os.stat(path).st_mtime_ns
+    cached = _cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except json.JSONDecodeError as error:
+            raise ValueError(f"{path} is not valid JSON: {error}") from None
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: a level must be a JSON object")
+
+    level = LevelDescription(data, path)
+    _cache[path] = (mtime, level)
+    return level
+
+
+def _entries(data, key, where, required=False):
+    if key not in data and not required:
+        return []
+    entries = data.get(key)
+    if not isinstance(entries, list):
+        raise ValueError(f"{where}: {key} must be a list")
+    for i, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            raise ValueError(f"{where}: {key}[{i}] must be an object")
+    return entries
+
+
+def _object(data, key, where):
+    entry = data.get(key)
+    if not isinstance(entry, dict):
+        raise ValueError(f"{where}: {key} must be an object")
+    return entry
+
+
+def _number(entry, key, where, default=None, positive=False, integer=False):
+    value = entry.get(key, default)
+    kinds = int if integer else (int, float)
+    # bool is an int subclass, but true/false is never a valid value
+    if value is None or isinstance(value, bool) or not isinstance(value, kinds):
+        raise ValueError(f"{where}: {key} must be {'an integer' if integer else 'a number'}")
+    if positive and value <= 0:
+        raise ValueError(f"{where}: {key} must be positive")
+    return value
+
+
+def _string(entry, key, where, default=None):
+    value = entry.get(key, default)
+    if not isinstance(value, str):
+        raise ValueError(f"{where}: {key} must be a string")
+    return value
+
+
+def _choice(entry, key, choices, where, default=None):
+    value = entry.get(key, default)
+    if value not in choices:
+        raise ValueError(f"{where}: {key} must be one of {', '.join(choices)}")
+    return value
+
+
+def _point(entry, where):
+    # Positions and sizes are whole pixels, as pygame.Rect stores them
+    return _number(entry, "x", where, integer=True), _number(entry, "y", where, integer=True)
+
+
+def _rect(entry, where):
+    return _point(entry, where) + (_number(entry, "width", where, positive=True, integer=True),
+                                   _number(entry, "height", where, positive=True, integer=True))
@@ -1,9 +1,14 @@
 # New updated code
 import pygame
+import numpy as np
 import sys
 import random
-import time
 import math
+import struct
+from bisect import bisect_left, bisect_right
+import zlib
+
+from levels import LevelFiles
 
 # Initialize Pygame
 pygame.init()
@@ -13,6 +18,10 @@ SCREEN_WIDTH = 1200
 SCREEN_HEIGHT = 700
 FPS = 60
 
+# Fixed simulation timestep, independent of the render rate
+SIM_STEP = 1.0 / FPS
+MAX_FRAME_TIME = 0.25
+
 # Colors
 FOREST_GREEN = (34, 139, 34)
 DEEP_BLUE = (44, 62, 80)
@@ -31,7 +40,289 @@ DARK_RED = (139, 0, 0)
 GRAVITY = 0.8
 JUMP_SPEED = -15
 PLAYER_SPEED = 5
-LEVEL_TIME_LIMITS = {1: 120, 2: 90, 3: 60}
+PLAYER_ACCELERATION = 0.5
+# Share of horizontal speed kept each frame with no direction held
+PLAYER_FRICTION = 0.8
+CAMERA_SMOOTHING = 0.1
+PATROL_RANGE = 200
+
+# Fixed-point physics keeps player velocities as integers in 1/FIXED_SCALE
+# pixel steps. A scale of 1000 holds the float constants above exactly.
+FIXED_SCALE = 1000
+FIXED_GRAVITY = round(GRAVITY * FIXED_SCALE)
+FIXED_JUMP_SPEED = round(JUMP_SPEED * FIXED_SCALE)
+FIXED_ACCELERATION = round(PLAYER_ACCELERATION * FIXED_SCALE)
+FIXED_FRICTION = round(PLAYER_FRICTION * FIXED_SCALE)
+
+# Levels are loaded in columns of CHUNK_WIDTH around the camera and the player.
+# Chunks within the load margin are loaded; chunks are evicted past the
+# wider evict margin, so a player on a chunk edge doesn't reload it every frame.
+CHUNK_WIDTH = 600
+CHUNK_LOAD_MARGIN = 1
+CHUNK_EVICT_MARGIN = 2
+# Levels with at least this many movers keep them in struct-of-arrays storage
+MOVER_ARRAY_THRESHOLD = 128
+PROJECTILE_SPEED = 15
+PROJECTILE_LIFE = 30
+# A projectile lives PROJECTILE_LIFE frames and at most one is fired per frame
+PROJECTILE_CAPACITY = 32
+# Platforms are one-way by default; solid ones also block the player's sides and head
+SOLID_PLATFORMS = False
+
+# Screen backgrounds as (top color, bottom color, bottom weight)
+BACKGROUNDS = {
+    "menu": (DEEP_BLUE, FOREST_GREEN, 1.0),
+    "level_select": (DEEP_BLUE, FOREST_GREEN, 1.0),
+    "game": (DEEP_BLUE, FOREST_GREEN, 0.3),
+    "game_over": ((DEEP_BLUE[0] + 20, DEEP_BLUE[1], DEEP_BLUE[2]), None, 0),
+    "victory": ((FOREST_GREEN[0] + 20, FOREST_GREEN[1] + 20, FOREST_GREEN[2]), None, 0),
+}
+
+
+def rect_round(values):
+    # pygame.Rect rounds float coordinates half away from zero
+    whole = np.trunc(values)
+    return (whole + np.sign(values) * (np.abs(values - whole) >= 0.5)).astype(np.int64)
+
+
+def fixed_friction(velocity, frames=1):
+    # Friction on a fixed-point velocity, truncated toward zero so it comes to rest
+    kept = abs(velocity) * FIXED_FRICTION ** frames // FIXED_SCALE ** frames
+    return kept if velocity >= 0 else -kept
+
+
+def fixed_pixels(distance):
+    # Whole pixels for a fixed-point distance, rounding halves up as Rect does for positive x
+    return (distance + FIXED_SCALE // 2) // FIXED_SCALE
+
+
+def rect_coord(value):
+    # The integer a pygame.Rect stores when a float is assigned to a coordinate
+    # (the constructor truncates instead, so this goes through assignment)
+    coord_rect.x = value
+    return coord_rect.x
+
+
+coord_rect = pygame.Rect(0, 0, 0, 0)
+
+
+def sign_run(start, step):
+    # How many terms of start, start + step, ... share start's sign, with zero
+    # counted as positive; None if they all do
+    positive = start >= 0
+    if step == 0 or (step > 0) == positive:
+        return None
+    terms = int(abs(start) // abs(step))
+    while terms > 0 and (start + (terms - 1) * step >= 0) != positive:
+        terms -= 1
+    while (start + terms * step >= 0) == positive:
+        terms += 1
+    return terms
+
+
+def move_platforms(x, direction, speed, origin, range_limit, dt=1):
+    """MovingPlatform.update over arrays. Returns the new x and direction."""
+    new_x = x + speed * direction * dt
+    offset = new_x - origin
+    reverse = np.abs(offset) > range_limit
+    clamped = np.where(offset > 0, origin + range_limit, origin - range_limit)
+    return (np.where(reverse, rect_round(clamped), rect_round(new_x)),
+            np.where(reverse, -direction, direction))
+
+
+def move_patrols(x, direction, speed, origin, dt=1):
+    """Patrol MovingObstacle.update over arrays. Returns the new x and direction."""
+    x = rect_round(x + speed * direction * dt)
+    return x, np.where(np.abs(x - origin) > PATROL_RANGE, -direction, direction)
+
+
+def swept_aabb(rect, dx, dy, target):
+    """Time of impact in [0, 1] and contact normal of rect moving by (dx, dy) into target.
+
+    Returns None if the move does not hit target, or if the two already
+    overlap at the start of the move.
+    """
+    if dx > 0:
+        x_entry = (target.left - rect.right) / dx
+        x_exit = (target.right - rect.left) / dx
+    elif dx < 0:
+        x_entry = (target.right - rect.left) / dx
+        x_exit = (target.left - rect.right) / dx
+    elif rect.right <= target.left or rect.left >= target.right:
+        return None
+    else:
+        x_entry, x_exit = -math.inf, math.inf
+
+    if dy > 0:
+        y_entry = (target.top - rect.bottom) / dy
+        y_exit = (target.bottom - rect.top) / dy
+    elif dy < 0:
+        y_entry = (target.bottom - rect.top) / dy
+        y_exit = (target.top - rect.bottom) / dy
+    elif rect.bottom <= target.top or rect.top >= target.bottom:
+        return None
+    else:
+        y_entry, y_exit = -math.inf, math.inf
+
+    entry = max(x_entry, y_entry)
+    if entry >= min(x_exit, y_exit) or entry < 0 or entry > 1:
+        return None
+    if x_entry > y_entry:
+        return entry, (-1 if dx > 0 else 1, 0)
+    return entry, (0, -1 if dy > 0 else 1)
+
+
+class InputState:
+    """Controls for a single frame, decoupled from pygame's input devices."""
+
+    def __init__(self, left=False, right=False, run=False, jump=False, attack=False, shoot=False):
+        # Held controls
+        self.left = left
+        self.right = right
+        self.run = run
+        # One-shot actions for this frame
+        self.jump = jump
+        self.attack = attack
+        self.shoot = shoot
+
+    def to_bits(self):
+        return (self.left | self.right << 1 | self.run << 2 |
+                self.jump << 3 | self.attack << 4 | self.shoot << 5)
+
+    @classmethod
+    def from_bits(cls, bits):
+        return cls(left=bool(bits & 1), right=bool(bits & 2), run=bool(bits & 4),
+                   jump=bool(bits & 8), attack=bool(bits & 16), shoot=bool(bits & 32))
+
+    @classmethod
+    def from_devices(cls):
+        keys = pygame.key.get_pressed()
+        mouse_buttons = pygame.mouse.get_pressed()
+        return cls(left=keys[pygame.K_LEFT] or keys[pygame.K_a],
+                   right=keys[pygame.K_RIGHT] or keys[pygame.K_d],
+                   run=mouse_buttons[0])
+
+
+class Replay:
+    """Per-frame inputs for one level attempt, stored run-length encoded.
+
+    generator is the (seed, screens) of the levelgen.EndlessLevels the
+    level came from, or None for the level files.
+    """
+
+    MAGIC = b"TRRP"
+    VERSION = 3
+    # Version 1 files have no flags byte, and versions 1 and 2 store the
+    # level in one byte and have no generator
+    HEADERS = {
+        1: struct.Struct("<4sBBIII"),
+        2: struct.Struct("<4sBBIIIB"),
+        3: struct.Struct("<4sBIIIIBqI"),
+    }
+    RUN = struct.Struct("<HB")
+    FIXED_POINT = 1
+    GENERATED = 2
+
+    def __init__(self, level, seed, frames=None, checksum=0, fixed_point=False, generator=None):
+        self.level = level
+        self.seed = seed
+        self.frames = frames if frames is not None else []
+        self.checksum = checksum
+        self.fixed_point = fixed_point
+        self.generator = generator
+
+    def save(self, path):
+        runs = []
+        for bits in self.frames:
+            if runs and runs[-1][1] == bits and runs[-1][0] < 0xFFFF:
+                runs[-1][0] += 1
+            else:
+                runs.append([1, bits])
+
+        with open(path, "wb") as f:
+            flags = self.FIXED_POINT if self.fixed_point else 0
+            generator_seed, screens = 0, 0
+            if self.generator is not None:
+                flags |= self.GENERATED
+                generator_seed, screens = self.generator
+            f.write(self.HEADERS[self.VERSION].pack(self.MAGIC, self.VERSION, self.level, self.seed,
+                                                    len(self.frames), self.checksum, flags,
+                                                    generator_seed, screens))
+            for count, bits in runs:
+                f.write(self.RUN.pack(count, bits))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+
+        magic, version = data[:4], data[4] if len(data) > 4 else None
+        if magic != cls.MAGIC or version not in cls.HEADERS:
+            raise ValueError(f"{path} is not a Turbo Runners replay")
+        header = cls.HEADERS[version]
+        _, _, level, seed, frame_count, checksum, *extra = header.unpack_from(data)
+        flags = extra[0] if extra else 0
+        fixed_point = bool(flags & cls.FIXED_POINT)
+        generator = tuple(extra[1:]) if flags & cls.GENERATED else None
+
+        frames = []
+        for count, bits in cls.RUN.iter_unpack(data[header.size:]):
+            frames.extend([bits] * count)
+        if len(frames) != frame_count:
+            raise ValueError(f"{path} is truncated")
+        return cls(level, seed, frames, checksum, fixed_point, generator)
+
+    def play(self, game=None):
+        # Re-simulate the recorded frames headless with no frame cap
+        if game is None:
+            game = Game(headless=True, level_source=self.level_source())
+        game.fixed_point = self.fixed_point
+        game.start_level(self.level, self.seed)
+        for bits in self.frames:
+            game.step(InputState.from_bits(bits))
+        return game
+
+    def level_source(self):
+        # levelgen imports this module, so it is only imported once needed
+        if self.generator is None:
+            return LevelFiles()
+        from levelgen import EndlessLevels
+        return EndlessLevels(*self.generator)
+
+    def verify(self):
+        return self.play().state_checksum() == self.checksum
+
+
+class InputRecorder:
+    def __init__(self, game):
+        self.game = game
+        self.replay = Replay(game.current_level, game.seed, fixed_point=game.fixed_point,
+                             generator=replay_generator(game.levels))
+
+    def record(self, inputs, dt=1):
+        if dt != 1:
+            raise ValueError("replays can only record single-frame steps")
+        self.replay.frames.append(inputs.to_bits())
+
+    def finish(self):
+        self.game.recorder = None
+        self.replay.checksum = self.game.state_checksum()
+        return self.replay
+
+
+def replay_generator(levels):
+    """(seed, screens) a replay stores for a level source, None for level files.
+
+    Compiled bundles hold the same levels as the files they were compiled
+    from. Any other source can't be rebuilt when the replay is played.
+    """
+    from bundles import BundleFiles
+    from levelgen import EndlessLevels
+    if isinstance(levels, EndlessLevels):
+        return levels.seed, levels.screens
+    if isinstance(levels, (LevelFiles, BundleFiles)):
+        return None
+    raise ValueError(f"replays can't record levels from {type(levels).__name__}")
 
 
 class AnimatedBackground:
@@ -69,9 +360,569 @@ class AnimatedBackground:
                                 (cloud['x'], cloud['y'], cloud['size'], cloud['size'] // 2))
 
 
+class DirtyRectTracker:
+    """Collects the screen areas that changed since the last presented frame."""
+
+    def __init__(self):
+        self.rects = []
+        self.previous = []
+        self.full_redraw = True
+
+    def add(self, rect):
+        self.rects.append(rect)
+
+    def extend(self, rects):
+        self.rects.extend(rects)
+
+    def clear(self):
+        self.rects = []
+
+    def invalidate(self):
+        self.full_redraw = True
+
+    def present(self):
+        # Last frame's areas are pushed too, so whatever moved away gets erased
+        if self.full_redraw:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.previous + self.rects)
+        self.previous = self.rects
+        self.rects = []
+        self.full_redraw = False
+
+
+class VisibilityIndex:
+    """Entities sorted by the leftmost x they can reach, for viewport queries.
+
+    Each entity is indexed by its x_extent(), the span it covers over its
+    whole motion, so the index stays valid as entities move.
+    """
+
+    def __init__(self, entities):
+        entries = []
+        for index, entity in enumerate(entities):
+            if hasattr(entity, "x_extent"):
+                left, right = entity.x_extent()
+            else:
+                left, right = entity.rect.left, entity.rect.right
+            entries.append((left, right, index, entity))
+        entries.sort(key=lambda entry: entry[0])
+
+        self.entries = entries
+        self.lefts = [entry[0] for entry in entries]
+        self.max_width = max((right - left for left, right, _, _ in entries), default=0)
+        self.removed = set()
+
+    def discard(self, entity):
+        # Removed entities are skipped until enough pile up to rebuild the lists
+        self.removed.add(entity)
+        if len(self.removed) * 2 > len(self.entries):
+            self.entries = [entry for entry in self.entries if entry[3] not in self.removed]
+            self.lefts = [entry[0] for entry in self.entries]
+            self.removed = set()
+
+    def query(self, left, right):
+        # Entities whose current rect overlaps [left, right), in original list order
+        start = bisect_left(self.lefts, left - self.max_width)
+        stop = bisect_right(self.lefts, right)
+        removed = self.removed
+        found = [(index, entity) for entry_left, entry_right, index, entity in self.entries[start:stop]
+                 if entry_right > left and entity.rect.right > left and entity.rect.left < right
+                 and entity not in removed]
+        found.sort(key=lambda item: item[0])
+        return [entity for _, entity in found]
+
+
+class ActiveSet:
+    """Live entities of one kind, with O(1) removal.
+
+    Removing an entity moves the last live one into its slot, so loops
+    over the set never visit entities that have been collected.
+    """
+
+    def __init__(self, entities=()):
+        self.items = list(entities)
+        self.slots = {entity: i for i, entity in enumerate(self.items)}
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, entity):
+        return entity in self.slots
+
+    def discard(self, entity):
+        slot = self.slots.pop(entity, None)
+        if slot is None:
+            return
+        last = self.items.pop()
+        if last is not entity:
+            self.items[slot] = last
+            self.slots[last] = slot
+
+
+class ColliderSet:
+    """Platforms the player can land on, kept between frames.
+
+    Static platforms are sorted once on both axes. Moving platforms are
+    kept sorted by x with an insertion sort, which is linear while they
+    stay nearly in order. query() returns colliding platforms in the same
+    order as the old static-then-moving platform list.
+    """
+
+    def __init__(self, static, kinematic):
+        self.static = static
+        self.kinematic = kinematic
+
+        self.static_by_x = sorted(range(len(static)), key=lambda i: static[i].rect.left)
+        self.static_lefts = [static[i].rect.left for i in self.static_by_x]
+        self.static_by_y = sorted(range(len(static)), key=lambda i: static[i].rect.top)
+        self.static_tops = [static[i].rect.top for i in self.static_by_y]
+        self.static_width = max((p.rect.width for p in static), default=0)
+        self.static_height = max((p.rect.height for p in static), default=0)
+
+        self.kinematic_by_x = list(range(len(kinematic)))
+        self.kinematic_width = max((p.rect.width for p in kinematic), default=0)
+        self.resort()
+
+    def resort(self, lefts=None):
+        # Callers that keep kinematic x positions in an array can pass it to sort in one go
+        if lefts is not None:
+            order = np.argsort(lefts, kind="stable")
+            self.kinematic_by_x = order.tolist()
+            self.kinematic_lefts = lefts[order].tolist()
+            return
+
+        order = self.kinematic_by_x
+        platforms = self.kinematic
+        for i in range(1, len(order)):
+            index = order[i]
+            left = platforms[index].rect.left
+            j = i - 1
+            while j >= 0 and platforms[order[j]].rect.left > left:
+                order[j + 1] = order[j]
+                j -= 1
+            order[j + 1] = index
+        self.kinematic_lefts = [platforms[i].rect.left for i in order]
+
+    def query(self, rect):
+        # Sweep whichever static axis gives the shorter candidate run
+        x_start = bisect_left(self.static_lefts, rect.left - self.static_width)
+        x_stop = bisect_left(self.static_lefts, rect.right)
+        y_start = bisect_left(self.static_tops, rect.top - self.static_height)
+        y_stop = bisect_left(self.static_tops, rect.bottom)
+        if x_stop - x_start <= y_stop - y_start:
+            candidates = self.static_by_x[x_start:x_stop]
+        else:
+            candidates = self.static_by_y[y_start:y_stop]
+        hits = [self.static[i] for i in sorted(candidates) if rect.colliderect(self.static[i].rect)]
+
+        start = bisect_left(self.kinematic_lefts, rect.left - self.kinematic_width)
+        stop = bisect_left(self.kinematic_lefts, rect.right)
+        candidates = self.kinematic_by_x[start:stop]
+        hits.extend(self.kinematic[i] for i in sorted(candidates) if rect.colliderect(self.kinematic[i].rect))
+        return hits
+
+
+class PingPongPath:
+    """Closed-form path of a mover that runs back and forth between two limits.
+
+    The path is a series of legs, each a straight run at a constant rounded
+    step per frame. Rounding is away from zero, so a run that crosses x = 0
+    changes step and is split there. leg(x, direction) returns (frames,
+    step, next_state), with frames None for a leg that never ends. A step
+    pair (out, back) is a mover that turns every frame and drifts. After a
+    few turns a leg starts from a state seen before, so the table is short
+    and any frame is found with a bisect and a multiply.
+    """
+
+    def __init__(self, x, direction, leg):
+        self.starts = []
+        self.legs = []
+        self.cycle_start = None
+        self.cycle_frames = 0
+
+        seen = {}
+        frame = 0
+        state = (x, direction)
+        while state not in seen:
+            seen[state] = frame
+            frames, step, next_state = leg(*state)
+            self.starts.append(frame)
+            self.legs.append((state, step))
+            if frames is None:
+                return
+            frame += frames
+            state = next_state
+
+        self.cycle_start = seen[state]
+        self.cycle_frames = frame - self.cycle_start
+
+    def at(self, frame):
+        # (x, direction) after the given number of single-frame updates
+        if self.cycle_start is not None and frame >= self.cycle_start:
+            frame = self.cycle_start + (frame - self.cycle_start) % self.cycle_frames
+        i = bisect_right(self.starts, frame) - 1
+        (x, direction), step = self.legs[i]
+        offset = frame - self.starts[i]
+        if isinstance(step, tuple):
+            out, back = step
+            x += offset // 2 * (out + back)
+            if offset % 2:
+                return x + out, -direction
+            return x, direction
+        return x + offset * step, direction
+
+
+def fit_text(font, text, color, width):
+    # Text rendered no wider than width, cut short with ".." if it has to be
+    surface = font.render(text, True, color)
+    while surface.get_width() > width and len(text) > 1:
+        text = text[:-1]
+        surface = font.render(text.rstrip() + "..", True, color)
+    return surface
+
+
+def clamp_chunk(chunk, last_chunk):
+    return min(max(chunk, 0), last_chunk)
+
+
+def entity_extent(kind, params):
+    # The x_extent() an entity built from these level parameters will have
+    x = params[0]
+    if kind == "moving_platforms":
+        x, _, width, _, _, _, range_limit = params
+        return x - range_limit, x + range_limit + width
+    if kind == "obstacles":
+        x, _, width, _, obstacle_type, speed = params
+        if obstacle_type == "patrol":
+            reach = PATROL_RANGE + math.ceil(speed) + 1
+            return x - reach, x + reach + width
+        return x, x + width + 1
+    if kind == "collectibles":
+        return x, x + 25
+    if kind == "power_ups":
+        return x, x + 30
+    return x, x + params[2]
+
+
+def chunk_members(description):
+    """(kind, index) of every entity in each chunk of a level, by chunk."""
+    last_chunk = max(0, (description.width - 1) // CHUNK_WIDTH)
+    members = [[] for _ in range(last_chunk + 1)]
+    for kind in LevelStream.KINDS:
+        for index, params in enumerate(getattr(description, kind)):
+            left, right = entity_extent(kind, params)
+            first = clamp_chunk(int(left // CHUNK_WIDTH), last_chunk)
+            last = clamp_chunk(int((right - 1) // CHUNK_WIDTH), last_chunk)
+            for chunk in range(first, last + 1):
+                members[chunk].append((kind, index))
+    return members
+
+
+class LevelStream:
+    """A level's entities, built only for the chunks near the camera and player.
+
+    The level is cut into CHUNK_WIDTH columns. An entity belongs to every
+    chunk its x_extent() overlaps, so a wide hazard or a long-range mover
+    stays loaded wherever it can reach. Only entities of loaded chunks
+    exist, so the live entity count follows the window, not the level
+    length. Collected pickups are remembered by index. Movers that load
+    mid-level are placed at their closed-form position for the current
+    frame.
+    """
+
+    KINDS = ("platforms", "moving_platforms", "obstacles", "collectibles", "power_ups")
+
+    def __init__(self, description, build):
+        self.build = build
+        self.params = {kind: getattr(description, kind) for kind in self.KINDS}
+        self.last_chunk = max(0, (description.width - 1) // CHUNK_WIDTH)
+
+        # Compiled level bundles carry their chunk index; other levels are indexed here
+        self.members = getattr(description, "chunk_members", None)
+        if self.members is None:
+            self.members = chunk_members(description)
+
+        self.chunks = set()
+        self.windows = None
+        self.entities = {kind: {} for kind in self.KINDS}
+        self.indices = {}
+        self.collected = set()
+
+    def clamp(self, chunk):
+        return clamp_chunk(chunk, self.last_chunk)
+
+    def window(self, left, margin):
+        # First and last chunk within margin chunks of a screen starting at left
+        return (self.clamp(left // CHUNK_WIDTH - margin),
+                self.clamp((left + SCREEN_WIDTH - 1) // CHUNK_WIDTH + margin))
+
+    def update(self, views, frame):
+        """Load chunks near each view's left edge and evict far ones.
+
+        Returns True if any entity was built or dropped.
+        """
+        windows = tuple(self.window(left, CHUNK_LOAD_MARGIN) for left in views)
+        if windows == self.windows:
+            return False
+        self.windows = windows
+
+        chunks = set()
+        for left in views:
+            first, last = self.window(left, CHUNK_EVICT_MARGIN)
+            chunks.update(range(first, last + 1))
+        chunks &= self.chunks
+        for first, last in windows:
+            chunks.update(range(first, last + 1))
+        if chunks == self.chunks:
+            return False
+        self.chunks = chunks
+
+        needed = {member for chunk in chunks for member in self.members[chunk]}
+        changed = False
+        for kind, entities in self.entities.items():
+            for index in [index for index in entities if (kind, index) not in needed]:
+                del self.indices[entities.pop(index)]
+                changed = True
+        for kind, index in needed:
+            if index in self.entities[kind] or (kind, index) in self.collected:
+                continue
+            entity = self.build(kind, self.params[kind][index])
+            if frame and hasattr(entity, "motion_at"):
+                entity.rect.x, entity.direction = entity.motion_at(frame)
+            self.entities[kind][index] = entity
+            self.indices[entity] = index
+            changed = True
+        return changed
+
+    def collect(self, kind, entity):
+        # Collected pickups stay gone when their chunk is loaded again
+        self.collected.add((kind, self.indices[entity]))
+
+    def loaded(self, kind):
+        # Live entities of one kind in level file order
+        entities = self.entities[kind]
+        return [entities[index] for index in sorted(entities) if (kind, index) not in self.collected]
+
+
+class MoverArrays:
+    """Struct-of-arrays storage for moving platforms and patrol obstacles.
+
+    Positions, directions, speeds, origins and ranges are kept in NumPy
+    arrays and one kernel call moves every mover of a kind. Rects are
+    written back only where the rounded x changed, so collision and
+    drawing code keep reading entity rects. While this storage is in use
+    the arrays, not the entities, hold each mover's direction;
+    store_directions() copies them back.
+    """
+
+    def __init__(self, platforms, patrols):
+        # Copies, since the game's lists change in place as chunks load
+        self.platforms = list(platforms)
+        self.platform_x = np.array([p.rect.x for p in platforms], dtype=np.int64)
+        self.platform_dir = np.array([p.direction for p in platforms], dtype=np.float64)
+        self.platform_speed = np.array([p.speed for p in platforms], dtype=np.float64)
+        self.platform_origin = np.array([p.original_x for p in platforms], dtype=np.float64)
+        self.platform_range = np.array([p.range_limit for p in platforms], dtype=np.float64)
+
+        self.patrols = list(patrols)
+        self.patrol_x = np.array([o.rect.x for o in patrols], dtype=np.int64)
+        self.patrol_dir = np.array([o.direction for o in patrols], dtype=np.int64)
+        self.patrol_speed = np.array([o.speed for o in patrols], dtype=np.float64)
+        self.patrol_origin = np.array([o.original_x for o in patrols], dtype=np.int64)
+        self.patrol_width = np.array([o.rect.width for o in patrols], dtype=np.int64)
+
+    def update(self, dt=1):
+        # Returns the patrol x positions from before the move
+        x, self.platform_dir = move_platforms(self.platform_x, self.platform_dir, self.platform_speed,
+                                              self.platform_origin, self.platform_range, dt)
+        self.write_back(self.platforms, self.platform_x, x)
+        self.platform_x = x
+
+        previous = self.patrol_x
+        x, self.patrol_dir = move_patrols(previous, self.patrol_dir, self.patrol_speed,
+                                          self.patrol_origin, dt)
+        self.write_back(self.patrols, previous, x)
+        self.patrol_x = x
+        return previous
+
+    def store_directions(self):
+        for platform, direction in zip(self.platforms, self.platform_dir.tolist()):
+            platform.direction = direction
+        for patrol, direction in zip(self.patrols, self.patrol_dir.tolist()):
+            patrol.direction = direction
+
+    @staticmethod
+    def write_back(entities, old_x, new_x):
+        changed = np.flatnonzero(old_x != new_x)
+        for i, x in zip(changed.tolist(), new_x[changed].tolist()):
+            entities[i].rect.x = x
+
+
+class SpatialHash:
+    """Uniform grid mapping cells to the entities whose rects touch them.
+
+    Static entities are inserted once. Moving ones call update() after they
+    move, which only touches the grid when their cell span changes.
+    """
+
+    def __init__(self, cell_size=128):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.spans = {}
+        self.order = {}
+
+    def span(self, rect):
+        size = self.cell_size
+        return (rect.left // size, rect.top // size,
+                (rect.right - 1) // size, (rect.bottom - 1) // size)
+
+    def insert(self, entity):
+        # Query results come back in insertion order
+        self.order.setdefault(entity, len(self.order))
+        span = self.span(entity.rect)
+        self.spans[entity] = span
+        for cx in range(span[0], span[2] + 1):
+            for cy in range(span[1], span[3] + 1):
+                self.cells.setdefault((cx, cy), {})[entity] = None
+
+    def remove(self, entity):
+        span = self.spans.pop(entity, None)
+        if span is None:
+            return
+        for cx in range(span[0], span[2] + 1):
+            for cy in range(span[1], span[3] + 1):
+                cell = self.cells[(cx, cy)]
+                del cell[entity]
+                if not cell:
+                    del self.cells[(cx, cy)]
+
+    def update(self, entity):
+        if self.span(entity.rect) != self.spans.get(entity):
+            self.remove(entity)
+            self.insert(entity)
+
+    def query(self, rect, after=None):
+        # Entities colliding with rect, optionally only those inserted after another
+        found = {}
+        x0, y0, x1, y1 = self.span(rect)
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = self.cells.get((cx, cy))
+                if cell:
+                    found.update(cell)
+
+        first = self.order[after] + 1 if after is not None else 0
+        hits = [entity for entity in found
+                if self.order[entity] >= first and rect.colliderect(entity.rect)]
+        hits.sort(key=self.order.__getitem__)
+        return hits
+
+
+class SpriteCache:
+    """Pre-rendered entity images keyed by their visual state."""
+
+    def __init__(self):
+        self.sprites = {}
+
+    def get(self, key, size, paint):
+        surface = self.sprites.get(key)
+        if surface is None:
+            surface = pygame.Surface(size, pygame.SRCALPHA)
+            paint(surface)
+            if pygame.display.get_surface():
+                surface = surface.convert_alpha()
+            self.sprites[key] = surface
+        return surface
+
+
+sprite_cache = SpriteCache()
+
+
+class ProjectilePool:
+    """The player's projectiles, stored as fixed-capacity parallel arrays.
+
+    Slots are handed out from a free list and returned when a projectile
+    expires, so shooting never allocates. Movement, expiry and hit tests
+    run over all slots at once.
+    """
+
+    def __init__(self, capacity=PROJECTILE_CAPACITY):
+        self.x = np.zeros(capacity, dtype=np.int64)
+        self.y = np.zeros(capacity, dtype=np.int64)
+        self.life = np.zeros(capacity, dtype=np.int64)
+        self.hit = np.zeros(capacity, dtype=bool)
+        self.live = np.zeros(capacity, dtype=bool)
+        # Firing order, so records() lists projectiles oldest first
+        self.serial = np.zeros(capacity, dtype=np.int64)
+        self.next_serial = 0
+        self.free = list(range(capacity - 1, -1, -1))
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def spawn(self, x, y):
+        # A full pool drops the shot rather than growing
+        if not self.free:
+            return None
+        slot = self.free.pop()
+        self.x[slot] = x
+        self.y[slot] = y
+        self.life[slot] = PROJECTILE_LIFE
+        self.hit[slot] = False
+        self.live[slot] = True
+        self.serial[slot] = self.next_serial
+        self.next_serial += 1
+        self.count += 1
+        return slot
+
+    def update(self, dt=1):
+        if not self.count:
+            return
+        live = self.live
+        self.x[live & ~self.hit] += PROJECTILE_SPEED * dt
+        self.life[live] -= dt
+
+        expired = np.flatnonzero(live & (self.life <= 0))
+        if len(expired):
+            live[expired] = False
+            self.free.extend(expired.tolist())
+            self.count -= len(expired)
+
+    def strike(self, target_x, reach):
+        # Marks live projectiles within reach of target_x as hits and returns how many
+        if not self.count:
+            return 0
+        struck = self.live & (np.abs(self.x - target_x) < reach)
+        self.hit |= struck
+        return int(np.count_nonzero(struck))
+
+    def positions(self):
+        slots = np.flatnonzero(self.live)
+        return zip(self.x[slots].tolist(), self.y[slots].tolist())
+
+    def records(self):
+        # (x, life) of each live projectile, oldest first
+        slots = np.flatnonzero(self.live)
+        slots = slots[np.argsort(self.serial[slots], kind="stable")]
+        return tuple(zip(self.x[slots].tolist(), self.life[slots].tolist()))
+
+    def clear(self):
+        self.live[:] = False
+        self.free = list(range(len(self.live) - 1, -1, -1))
+        self.count = 0
+
+
 class Player:
-    def __init__(self, x, y):
+    def __init__(self, x, y, fixed_point=False):
         self.rect = pygame.Rect(x, y, 40, 60)
+        # Fixed-point players keep vel_x and vel_y in 1/FIXED_SCALE pixel units
+        self.fixed_point = fixed_point
+        self.world_width = SCREEN_WIDTH
         self.vel_y = 0
         self.vel_x = 0
         self.on_ground = False
@@ -80,50 +931,87 @@ class Player:
         self.score = 0
         self.running = False
         self.animation_frame = 0
-        self.projectiles = []
+        self.projectiles = ProjectilePool()
 
-    def update(self, platforms):
+    def update(self, colliders, controls=None, dt=1):
+        # dt is in frames; coarse steps rely on the swept tests below to avoid tunneling
         # Handle movement
-        keys = pygame.key.get_pressed()
-        mouse_buttons = pygame.mouse.get_pressed()
+        if controls is None:
+            controls = InputState.from_devices()
 
         # Mouse controls
-        if mouse_buttons[0]:
+        if controls.run:
             self.running = True
             self.speed = PLAYER_SPEED * 1.8
         else:
             self.running = False
             self.speed = PLAYER_SPEED
 
-        # Keyboard movement with acceleration
-        if keys[pygame.K_LEFT] or keys[pygame.K_a]:
-            self.vel_x = max(self.vel_x - 0.5, -self.speed)
-        elif keys[pygame.K_RIGHT] or keys[pygame.K_d]:
-            self.vel_x = min(self.vel_x + 0.5, self.speed)
+        if self.fixed_point:
+            acceleration = FIXED_ACCELERATION
+            speed = round(self.speed * FIXED_SCALE)
+            gravity = FIXED_GRAVITY
         else:
-            self.vel_x *= 0.8  # Friction
+            acceleration = PLAYER_ACCELERATION
+            speed = self.speed
+            gravity = GRAVITY
 
-        self.rect.x += self.vel_x
+        # Keyboard movement with acceleration
+        if controls.left:
+            self.vel_x = max(self.vel_x - acceleration * dt, -speed)
+        elif controls.right:
+            self.vel_x = min(self.vel_x + acceleration * dt, speed)
+        elif self.fixed_point:
+            self.vel_x = fixed_friction(self.vel_x, dt)
+        else:
+            self.vel_x *= PLAYER_FRICTION ** dt  # Friction
+
+        start = self.rect.copy()
+        self.rect.x += self.displacement(self.vel_x, dt)
+        if SOLID_PLATFORMS:
+            hit = self.sweep(colliders, start)
+            if hit:
+                _, normal, platform = hit
+                if normal[0] < 0:
+                    self.rect.right = platform.rect.left
+                else:
+                    self.rect.left = platform.rect.right
+                self.vel_x = 0
 
         # Apply gravity
-        self.vel_y += GRAVITY
-        self.rect.y += self.vel_y
+        self.vel_y += gravity * dt
+        start = self.rect.copy()
+        self.rect.y += self.displacement(self.vel_y, dt)
 
         # Platform collision
         self.on_ground = False
-        for platform in platforms:
-            if self.rect.colliderect(platform.rect):
-                if self.vel_y > 0:  # Falling
+
+        # A move longer than the player is tall can skip over a platform entirely,
+        # so it is swept for the first surface crossed
+        if SOLID_PLATFORMS or abs(self.rect.y - start.y) > self.rect.height:
+            hit = self.sweep(colliders, start)
+            if hit:
+                _, normal, platform = hit
+                if normal[1] < 0 and self.vel_y > 0:
                     self.rect.bottom = platform.rect.top
                     self.vel_y = 0
                     self.on_ground = True
+                elif normal[1] > 0 and SOLID_PLATFORMS:
+                    self.rect.top = platform.rect.bottom
+                    self.vel_y = 0
+
+        for platform in colliders.query(self.rect):
+            if self.vel_y > 0:  # Falling
+                self.rect.bottom = platform.rect.top
+                self.vel_y = 0
+                self.on_ground = True
 
         # Screen boundaries
         if self.rect.left < 0:
             self.rect.left = 0
             self.vel_x = 0
-        if self.rect.right > SCREEN_WIDTH:
-            self.rect.right = SCREEN_WIDTH
+        if self.rect.right > self.world_width:
+            self.rect.right = self.world_width
             self.vel_x = 0
 
         # Death by falling
@@ -135,50 +1023,73 @@ class Player:
             self.vel_x = 0
 
         # Update animation
-        self.animation_frame += 1
+        self.animation_frame += dt
+
+    def displacement(self, velocity, dt=1):
+        # Distance moved this step; float distances are rounded by the rect
+        if self.fixed_point:
+            return fixed_pixels(velocity * dt)
+        return velocity * dt
+
+    def velocity(self):
+        # (vel_x, vel_y) in pixels per frame in either physics mode
+        if self.fixed_point:
+            return self.vel_x / FIXED_SCALE, self.vel_y / FIXED_SCALE
+        return self.vel_x, self.vel_y
+
+    def sweep(self, colliders, start):
+        # Earliest platform hit moving from start to the current rect
+        dx = self.rect.x - start.x
+        dy = self.rect.y - start.y
+        if not dx and not dy:
+            return None
+
+        best = None
+        for platform in colliders.query(start.union(self.rect)):
+            hit = swept_aabb(start, dx, dy, platform.rect)
+            if hit and (best is None or hit[0] < best[0]):
+                best = (hit[0], hit[1], platform)
+        return best
 
     def jump(self):
         if self.on_ground:
-            self.vel_y = JUMP_SPEED
+            self.vel_y = FIXED_JUMP_SPEED if self.fixed_point else JUMP_SPEED
 
     def shoot(self):
         # Create a new projectile
-        self.projectiles.append({
-            'x': self.rect.centerx,
-            'y': self.rect.centery,
-            'life': 30,
-            'hit': False
-        })
-
-    def update_projectiles(self):
+        self.projectiles.spawn(self.rect.centerx, self.rect.centery)
+
+    def update_projectiles(self, dt=1):
         # Update projectiles
-        for proj in self.projectiles[:]:
-            if not proj['hit']:
-                proj['x'] += 15
-            proj['life'] -= 1
-            if proj['life'] <= 0:
-                self.projectiles.remove(proj)
+        self.projectiles.update(dt)
 
     def draw(self, screen, camera_offset=0):
+        # Returns the screen areas that were drawn to
+        drawn = []
+
         # Draw projectiles with camera offset
-        for proj in self.projectiles:
-            pygame.draw.circle(screen, (0, 191, 255), 
-                             (int(proj['x'] + camera_offset), int(proj['y'])), 6)
+        for x, y in self.projectiles.positions():
+            drawn.append(pygame.draw.circle(screen, (0, 191, 255), (int(x + camera_offset), y), 6))
 
         # Draw Blippo with correct camera offset
         x = self.rect.x + camera_offset
         bounce = math.sin(self.animation_frame * 0.3) * 2 if self.running else 0
-        color = ORANGE if self.running else YELLOW
+        drawn.append(screen.blit(self.sprite(), (x, round(self.rect.y + bounce))))
+        return drawn
 
-        body_rect = pygame.Rect(x, self.rect.y + bounce, self.rect.width, self.rect.height)
-        pygame.draw.rect(screen, color, body_rect, border_radius=10)
+    def sprite(self):
+        return sprite_cache.get(("player", self.running), self.rect.size, self.paint)
+
+    def paint(self, surface):
+        color = ORANGE if self.running else YELLOW
+        pygame.draw.rect(surface, color, (0, 0, self.rect.width, self.rect.height), border_radius=10)
 
         # Simple eyes
-        pygame.draw.circle(screen, BLACK, (x + 10, self.rect.y + 15 + bounce), 5)
-        pygame.draw.circle(screen, BLACK, (x + 30, self.rect.y + 15 + bounce), 5)
+        pygame.draw.circle(surface, BLACK, (10, 15), 5)
+        pygame.draw.circle(surface, BLACK, (30, 15), 5)
 
         # Simple smile
-        pygame.draw.arc(screen, BLACK, (x + 8, self.rect.y + 25 + bounce, 24, 15), 0, 3.14, 3)
+        pygame.draw.arc(surface, BLACK, (8, 25, 24, 15), 0, 3.14, 3)
 
 
 class MovingPlatform(pygame.sprite.Sprite):
@@ -188,12 +1099,14 @@ class MovingPlatform(pygame.sprite.Sprite):
         self.original_x = x
         self.speed = speed
         self.direction = direction
+        self.start_direction = direction
         self.range_limit = range_limit
         self.color = FOREST_GREEN
+        self.path = None
 
-    def update(self):
+    def update(self, dt=1):
         # Check if we're about to exceed the range limit
-        new_x = self.rect.x + (self.speed * self.direction)
+        new_x = self.rect.x + (self.speed * self.direction * dt)
         
         if abs(new_x - self.original_x) > self.range_limit:
             # Reverse direction before moving
@@ -207,6 +1120,50 @@ class MovingPlatform(pygame.sprite.Sprite):
             # Safe to move
             self.rect.x = new_x
 
+    def x_extent(self):
+        # Horizontal span the platform can cover over its whole path
+        return self.original_x - self.range_limit, self.original_x + self.range_limit + self.rect.width
+
+    def leg(self, x, direction):
+        # Plain moves while the next position stays in range, then one clamped turn
+        velocity = self.speed * direction
+        step = rect_coord(x + velocity) - x
+
+        def in_range(moves):
+            return abs(x + moves * step + velocity - self.original_x) <= self.range_limit
+
+        if not in_range(0):
+            moves = 0
+        elif step == 0:
+            return None, 0, None
+        else:
+            limit = self.original_x + (self.range_limit if step > 0 else -self.range_limit)
+            moves = max(0, int((limit - x - velocity) // step) + 1)
+            # The estimate can be off by one where float rounding meets the limit
+            while moves > 0 and not in_range(moves - 1):
+                moves -= 1
+            while in_range(moves):
+                moves += 1
+
+        cut = sign_run(x + velocity, step)
+        if cut is not None and cut < moves:
+            return cut, step, (x + cut * step, direction)
+
+        if x + moves * step + velocity > self.original_x + self.range_limit:
+            end = rect_coord(self.original_x + self.range_limit)
+        else:
+            end = rect_coord(self.original_x - self.range_limit)
+        return moves + 1, step, (end, -direction)
+
+    def motion_at(self, frame):
+        """x and direction after `frame` single-frame updates from the start."""
+        if self.path is None:
+            self.path = PingPongPath(self.original_x, self.start_direction, self.leg)
+        return self.path.at(frame)
+
+    def position_at(self, frame):
+        return self.motion_at(frame)[0], self.rect.y
+
     def draw(self, screen):
         pygame.draw.rect(screen, self.color, self.rect)
         pygame.draw.rect(screen, BLACK, self.rect, 2)
@@ -229,28 +1186,77 @@ class MovingObstacle:
         self.speed = speed
         self.direction = 1
         self.original_x = x
+        self.path = None
 
-    def update(self):
+    def update(self, dt=1):
         if self.type == "patrol":
-            self.rect.x += self.speed * self.direction
-            if abs(self.rect.x - self.original_x) > 200:
+            self.rect.x += self.speed * self.direction * dt
+            if abs(self.rect.x - self.original_x) > PATROL_RANGE:
                 self.direction *= -1
 
+    def x_extent(self):
+        # Patrols overshoot the patrol range by up to one step before turning
+        if self.type == "patrol":
+            reach = PATROL_RANGE + math.ceil(self.speed) + 1
+            return self.original_x - reach, self.original_x + reach + self.rect.width
+        return self.rect.x, self.rect.right + 1
+
+    def leg(self, x, direction):
+        # A patrol turns after the move that takes it past PATROL_RANGE
+        step = rect_coord(x + self.speed * direction) - x
+        if abs(x + step - self.original_x) > PATROL_RANGE:
+            # Rounding makes the outward step longer than the way back, so a
+            # turn can leave the patrol out of range and it turns every frame
+            turned = x + step
+            back = rect_coord(turned - self.speed * direction) - turned
+            offset = x - self.original_x
+            if abs(turned + back - self.original_x) > PATROL_RANGE and (step + back) * offset > 0:
+                return None, (step, back), None
+            moves = 1
+        elif step == 0:
+            return None, 0, None
+        elif step > 0:
+            moves = (self.original_x + PATROL_RANGE - x) // step + 1
+        else:
+            moves = (x - self.original_x + PATROL_RANGE) // -step + 1
+        moves = max(moves, 1)
+
+        cut = sign_run(x + self.speed * direction, step)
+        if cut is not None and cut < moves:
+            return cut, step, (x + cut * step, direction)
+        return moves, step, (x + moves * step, -direction)
+
+    def motion_at(self, frame):
+        """x and direction after `frame` single-frame updates from the start."""
+        if self.type != "patrol":
+            return self.rect.x, self.direction
+        if self.path is None:
+            self.path = PingPongPath(self.original_x, 1, self.leg)
+        return self.path.at(frame)
+
+    def position_at(self, frame):
+        return self.motion_at(frame)[0], self.rect.y
+
     def draw(self, screen):
+        screen.blit(self.sprite(), self.rect)
+
+    def sprite(self):
+        # Spikes include their bottom edge, so leave a pixel of room
+        size = (self.rect.width + 1, self.rect.height + 1)
+        return sprite_cache.get((self.type, size), size, self.paint)
+
+    def paint(self, surface):
+        width, height = self.rect.size
         if self.type == "patrol":
             # Simple red enemy
-            pygame.draw.rect(screen, RED, self.rect, border_radius=5)
+            pygame.draw.rect(surface, RED, (0, 0, width, height), border_radius=5)
             # Simple eyes
-            pygame.draw.circle(screen, BLACK, (self.rect.x + 10, self.rect.y + 10), 4)
-            pygame.draw.circle(screen, BLACK, (self.rect.x + 25, self.rect.y + 10), 4)
+            pygame.draw.circle(surface, BLACK, (10, 10), 4)
+            pygame.draw.circle(surface, BLACK, (25, 10), 4)
         elif self.type == "floating":
             # Floating spikes
-            points = [
-                (self.rect.x, self.rect.bottom),
-                (self.rect.x + self.rect.width // 2, self.rect.y),
-                (self.rect.right, self.rect.bottom)
-            ]
-            pygame.draw.polygon(screen, DARK_RED, points)
+            points = [(0, height), (width // 2, 0), (width, height)]
+            pygame.draw.polygon(surface, DARK_RED, points)
 
 
 class LordZing:
@@ -263,33 +1269,77 @@ class LordZing:
         self.defeated = False
         self.health = 3
 
-    def update(self):
+    def update(self, dt=1):
         if not self.defeated:
-            self.animation_frame += 1
+            self.animation_frame += dt
             # Simple movement pattern
-            self.rect.x = self.original_x + math.sin(self.animation_frame * 0.05) * self.movement_range
-            self.rect.y = self.original_y + math.sin(self.animation_frame * 0.03) * 30
+            self.rect.topleft = self.position_at(self.animation_frame)
+
+    def position_at(self, frame):
+        return (rect_coord(self.original_x + math.sin(frame * 0.05) * self.movement_range),
+                rect_coord(self.original_y + math.sin(frame * 0.03) * 30))
+
+    def seek(self, frame):
+        self.animation_frame = frame
+        self.rect.topleft = self.position_at(frame)
+
+    def x_extent(self):
+        reach = self.movement_range + 1
+        return self.original_x - reach, self.original_x + reach + self.rect.width
 
     def take_damage(self):
         self.health -= 1
         if self.health <= 0:
             self.defeated = True
 
+    # The health indicator floats above the body
+    SPRITE_TOP = 28
+
     def draw(self, screen):
         if not self.defeated:
-            # Draw Lord Zing body
-            pygame.draw.rect(screen, PURPLE, self.rect, border_radius=10)
-            # Simple eyes
-            pygame.draw.circle(screen, RED, (self.rect.x + 20, self.rect.y + 25), 8)
-            pygame.draw.circle(screen, RED, (self.rect.x + 60, self.rect.y + 25), 8)
-            # Health indicator
-            for i in range(self.health):
-                pygame.draw.circle(screen, RED, (self.rect.x + 10 + i * 20, self.rect.y - 20), 8)
+            screen.blit(self.sprite(), (self.rect.x, self.rect.y - self.SPRITE_TOP))
+
+    def sprite(self):
+        size = (self.rect.width, self.rect.height + self.SPRITE_TOP)
+        return sprite_cache.get(("lord_zing", self.health), size, self.paint)
+
+    def paint(self, surface):
+        top = self.SPRITE_TOP
+        # Draw Lord Zing body
+        pygame.draw.rect(surface, PURPLE, (0, top, self.rect.width, self.rect.height), border_radius=10)
+        # Simple eyes
+        pygame.draw.circle(surface, RED, (20, top + 25), 8)
+        pygame.draw.circle(surface, RED, (60, top + 25), 8)
+        # Health indicator
+        for i in range(self.health):
+            pygame.draw.circle(surface, RED, (10 + i * 20, top - 20), 8)
+
+
+def struggle_offset(frame):
+    """How far the friend's struggle has moved it after `frame` frames.
+
+    Each frame rounds sin(0.2 * k) * 3 into rect.x. For a positive x the
+    rounded step depends only on k, so the offsets are a prefix sum of the
+    steps, extended as later frames are asked for.
+    """
+    global struggle_offsets
+    known = len(struggle_offsets)
+    if frame >= known:
+        size = max(frame + 1, 2 * known)
+        steps = rect_round(np.sin(np.arange(known, size) * 0.2) * 3)
+        offsets = struggle_offsets[-1] + np.cumsum(steps, dtype=np.int32)
+        struggle_offsets = np.concatenate((struggle_offsets, offsets))
+    return int(struggle_offsets[frame])
+
+
+# The offsets stay small, so int32 keeps long tables compact
+struggle_offsets = np.zeros(1, dtype=np.int32)
 
 
 class Friend:
     def __init__(self, x, y):
         self.rect = pygame.Rect(x, y, 35, 55)
+        self.original_x = x
         self.animation_frame = 0
         self.rescued = False
         self.cage_bars = []
@@ -298,12 +1348,17 @@ class Friend:
         for i in range(6):
             self.cage_bars.append(pygame.Rect(x - 20 + i * 15, y - 20, 5, 95))
 
-    def update(self):
-        self.animation_frame += 1
+    def update(self, dt=1):
+        self.animation_frame += dt
         # Simple struggling animation when not rescued
         if not self.rescued:
             struggle = math.sin(self.animation_frame * 0.2) * 3
-            self.rect.x += struggle
+            self.rect.x += struggle * dt
+
+    def seek(self, frame):
+        self.animation_frame = frame
+        if not self.rescued:
+            self.rect.x = self.original_x + struggle_offset(frame)
 
     def rescue(self):
         self.rescued = True
@@ -312,24 +1367,38 @@ class Friend:
     def draw(self, screen):
         # Draw cage if not rescued
         if not self.rescued:
-            for bar in self.cage_bars:
-                pygame.draw.rect(screen, GRAY, bar)
+            screen.blit(self.cage_sprite(), self.cage_bars[0].topleft)
 
         # Draw friend
+        screen.blit(self.sprite(), self.rect)
+
+    def sprite(self):
+        return sprite_cache.get(("friend", self.rescued), self.rect.size, self.paint)
+
+    def cage_sprite(self):
+        cage = self.cage_bars[0].unionall(self.cage_bars)
+        return sprite_cache.get(("cage", cage.size), cage.size, self.paint_cage)
+
+    def paint_cage(self, surface):
+        left, top = self.cage_bars[0].topleft
+        for bar in self.cage_bars:
+            pygame.draw.rect(surface, GRAY, bar.move(-left, -top))
+
+    def paint(self, surface):
         color = LIGHT_BLUE if not self.rescued else (0, 255, 0)
-        pygame.draw.rect(screen, color, self.rect, border_radius=8)
+        pygame.draw.rect(surface, color, (0, 0, self.rect.width, self.rect.height), border_radius=8)
 
         # Eyes
         if not self.rescued:
             # Worried eyes
-            pygame.draw.ellipse(screen, BLACK, (self.rect.x + 8, self.rect.y + 12, 8, 12))
-            pygame.draw.ellipse(screen, BLACK, (self.rect.x + 22, self.rect.y + 12, 8, 12))
+            pygame.draw.ellipse(surface, BLACK, (8, 12, 8, 12))
+            pygame.draw.ellipse(surface, BLACK, (22, 12, 8, 12))
         else:
             # Happy eyes
-            pygame.draw.circle(screen, BLACK, (self.rect.x + 10, self.rect.y + 15), 4)
-            pygame.draw.circle(screen, BLACK, (self.rect.x + 25, self.rect.y + 15), 4)
+            pygame.draw.circle(surface, BLACK, (12, 15), 4)
+            pygame.draw.circle(surface, BLACK, (23, 15), 4)
             # Happy smile
-            pygame.draw.arc(screen, BLACK, (self.rect.x + 5, self.rect.y + 25, 25, 20), 0, 3.14, 3)
+            pygame.draw.arc(surface, BLACK, (5, 25, 25, 20), 0, 3.14, 3)
 
 
 class PowerUp:
@@ -343,14 +1412,20 @@ class PowerUp:
 
     def draw(self, screen):
         if not self.collected:
-            if self.type == "speed":
-                color = (0, 255, 255)
-            elif self.type == "jump":
-                color = (255, 255, 0)
-            elif self.type == "attack":
-                color = (255, 0, 0)
+            screen.blit(self.sprite(), self.rect)
 
-            pygame.draw.rect(screen, color, self.rect, border_radius=15)
+    def sprite(self):
+        return sprite_cache.get(("power_up", self.type, self.rect.size), self.rect.size, self.paint)
+
+    def paint(self, surface):
+        if self.type == "speed":
+            color = (0, 255, 255)
+        elif self.type == "jump":
+            color = (255, 255, 0)
+        elif self.type == "attack":
+            color = (255, 0, 0)
+
+        pygame.draw.rect(surface, color, (0, 0, self.rect.width, self.rect.height), border_radius=15)
 
 
 class Collectible:
@@ -363,177 +1438,377 @@ class Collectible:
 
     def draw(self, screen):
         if not self.collected:
-            # Simple coin
-            pygame.draw.ellipse(screen, YELLOW, self.rect)
-            pygame.draw.ellipse(screen, BLACK, self.rect, 2)
+            screen.blit(self.sprite(), self.rect)
+
+    def sprite(self):
+        return sprite_cache.get(("coin", self.rect.size), self.rect.size, self.paint)
+
+    def paint(self, surface):
+        # Simple coin
+        rect = (0, 0, self.rect.width, self.rect.height)
+        pygame.draw.ellipse(surface, YELLOW, rect)
+        pygame.draw.ellipse(surface, BLACK, rect, 2)
+
+
+class GlyphAtlas:
+    """Glyphs of one font and color rasterized once into a single surface.
+
+    Strings are drawn by blitting each character's glyph at its advance, with
+    no kerning. Labels are rendered whole once, so a "label + number" line
+    costs one blit for the label and one per digit.
+    """
+
+    CHARSET = "".join(chr(code) for code in range(32, 127))
+
+    def __init__(self, font, color, charset=CHARSET):
+        self.font = font
+        self.color = color
+        self.height = font.get_height()
+        self.glyphs = {}
+        self.labels = {}
+
+        rendered = [(char, font.render(char, True, color)) for char in charset]
+        self.surface = pygame.Surface((sum(glyph.get_width() for _, glyph in rendered), self.height),
+                                      pygame.SRCALPHA)
+        x = 0
+        for char, glyph in rendered:
+            # MAX blending copies the glyph's pixels onto the transparent atlas unchanged
+            self.surface.blit(glyph, (x, 0), special_flags=pygame.BLEND_RGBA_MAX)
+            area = pygame.Rect(x, 0, glyph.get_width(), glyph.get_height())
+            self.glyphs[char] = (area, font.metrics(char)[0][4])
+            x += glyph.get_width()
+
+        if pygame.display.get_surface():
+            self.surface = self.surface.convert_alpha()
+
+    def draw(self, screen, text, pos, blits=None):
+        x, y = pos
+        if blits is None:
+            blits = []
+        for char in text:
+            glyph = self.glyphs.get(char)
+            if glyph is None:
+                glyph = self.glyphs["?"]
+            blits.append((self.surface, (x, y), glyph[0]))
+            x += glyph[1]
+        screen.blits(blits, doreturn=False)
+        return pygame.Rect(pos[0], y, x - pos[0], self.height)
+
+    def draw_label(self, screen, label, value, pos):
+        surface = self.labels.get(label)
+        if surface is None:
+            surface = self.labels[label] = self.font.render(label, True, self.color)
+        x, y = pos
+        rect = self.draw(screen, value, (x + surface.get_width(), y), [(surface, pos)])
+        return rect.union((x, y, surface.get_width(), self.height))
+
+
+class HUD:
+    """Retained in-game overlay that re-renders a field only when its value changes."""
+
+    CONTROLS = [
+        "Hold MOUSE: Run",
+        "CLICK/SPACE: Jump",
+        "Press ENTER to Shoot"
+    ]
+
+    def __init__(self, font):
+        self.panel = pygame.Surface((300, 140))
+        self.panel.set_alpha(180)
+        self.panel.fill(DEEP_BLUE)
+
+        self.lives_label = font.render("Lives:", True, WHITE)
+        controls_font = pygame.font.Font(None, 24)
+        self.controls = [controls_font.render(control, True, WHITE) for control in self.CONTROLS]
+
+        self.fields = {}
+
+    def field(self, name, value, render):
+        # Returns the field's surface and whether it had to be re-rendered
+        cached = self.fields.get(name)
+        if cached is not None and cached[0] == value:
+            return cached[1], False
+        surface = render(value)
+        self.fields[name] = (value, surface)
+        return surface, True
+
+    def render_hearts(self, lives):
+        surface = pygame.Surface((max(lives, 0) * 25, 18), pygame.SRCALPHA)
+        for i in range(lives):
+            heart_x = i * 25
+            pygame.draw.polygon(surface, RED, [
+                (heart_x, 5), (heart_x + 5, 0), (heart_x + 10, 0),
+                (heart_x + 15, 5), (heart_x + 15, 10), (heart_x + 7.5, 17), (heart_x, 10)
+            ])
+        return surface
 
 
 class Game:
-    def __init__(self):
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        pygame.display.set_caption("Turbo Runners")
+    # Screens that only change when the state does
+    STATIC_STATES = ("menu", "level_select", "game_over", "victory")
+    # Level select pages hold four rows of level buttons
+    LEVEL_BUTTON_COLUMNS = 9
+    LEVELS_PER_PAGE = LEVEL_BUTTON_COLUMNS * 4
+
+    def __init__(self, headless=False, seed=None, dirty_rects=True, mover_arrays=None, fixed_point=False,
+                 level_source=None):
+        # Headless games simulate without a window and never draw
+        self.headless = headless
+        if headless:
+            self.screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+        else:
+            self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+            pygame.display.set_caption("Turbo Runners")
         self.clock = pygame.time.Clock()
         self.font = pygame.font.Font(None, 48)
         self.small_font = pygame.font.Font(None, 32)
+        self.hud = HUD(self.small_font)
 
         self.state = "menu"
         self.current_level = 1
-        self.start_time = 0
+        # Levels come from the level files unless another source (such as
+        # levelgen.EndlessLevels) is given; it needs load(number) and count
+        self.levels = level_source or LevelFiles()
+        self.level_count = self.levels.count
+        self.level_page = 0
         self.game_stats = {"deaths": 0, "coins_collected": 0, "time_taken": 0}
 
         self.background = AnimatedBackground()
+        self.background_cache = {}
+
+        # Dirty-rect mode pushes only changed areas to the display
+        self.dirty_rects = dirty_rects
+        self.dirty = DirtyRectTracker()
+        self.drawn_state = None
+        self.drawn_camera = None
+        self.drawn_hud = None
+        self.drawn_timer = None
+
+        # None picks struct-of-arrays mover storage for levels with many movers
+        self.mover_arrays = mover_arrays
+        # Integer player physics, so runs reproduce bit for bit on any machine
+        self.fixed_point = fixed_point
+
+        # F3 toggles a debug overlay whose values change every frame
+        self.show_debug = False
+        self.debug_atlas = None
+        self.debug_panel = None
         self.camera_offset = 0
         self.screen_shake = 0
 
+        # Gameplay randomness is seeded so recorded inputs replay identically
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.rng = random.Random(self.seed)
+        self.pending_input = InputState()
+        self.recorder = None
+
         self.reset_game()
 
     def reset_game(self):
-        self.player = Player(50, 500)
+        self.player = Player(50, 500, self.fixed_point)
         self.platforms = []
         self.moving_platforms = []
         self.obstacles = []
         self.collectibles = []
         self.power_ups = []
+        self.movers = None
         self.lord_zing = None
         self.friend = None
         self.level_complete = False
-        self.start_time = time.time()
+        self.level_frames = 0
+        self.previous_positions = []
+        self.previous_camera = 0
         self.camera_offset = 0
         self.create_level(self.current_level)
 
     def create_level(self, level):
-        self.platforms.clear()
-        self.moving_platforms.clear()
-        self.obstacles.clear()
-        self.collectibles.clear()
-        self.power_ups.clear()
-
-        # Ground platform
-        self.platforms.append(Platform(0, SCREEN_HEIGHT - 50, SCREEN_WIDTH, 50))
-
-        if level == 1:  # Easy
-            # Static platforms
-            self.platforms.extend([
-                Platform(200, 550, 150, 20),
-                Platform(450, 450, 150, 20),
-                Platform(700, 350, 150, 20)
-            ])
-
-            # Moving platforms
-            self.moving_platforms.extend([
-                MovingPlatform(350, 500, 100, 20, speed=1, range_limit=100),
-                MovingPlatform(600, 300, 100, 20, speed=1.5, range_limit=80)
-            ])
-
-            # Moving obstacles
-            self.obstacles.extend([
-                MovingObstacle(300, 610, 35, 35, "patrol", speed=1),
-                MovingObstacle(500, 400, 30, 30, "floating")
-            ])
-
-            # Collectibles
-            for i in range(6):
-                collectible = Collectible(250 + i * 150, 400 - i * 30)
-                self.collectibles.append(collectible)
-
-            # Power-ups
-            self.power_ups.append(PowerUp(400, 400, "speed"))
-
-            # Lord Zing and Friend at the end
-            self.lord_zing = LordZing(950, 200)
-            self.friend = Friend(1000, 250)
-
-        elif level == 2:  # Medium
-            self.platforms.extend([
-                Platform(150, 580, 100, 20),
-                Platform(350, 480, 80, 20),
-                Platform(550, 380, 80, 20),
-                Platform(750, 280, 80, 20),
-                Platform(950, 180, 100, 20)
-            ])
-
-            self.moving_platforms.extend([
-                MovingPlatform(250, 530, 80, 20, speed=2, range_limit=120),
-                MovingPlatform(450, 430, 80, 20, speed=1.5, range_limit=100),
-                MovingPlatform(650, 330, 80, 20, speed=2.5, range_limit=90),
-                MovingPlatform(850, 230, 80, 20, speed=1.8, range_limit=110)
-            ])
-
-            self.obstacles.extend([
-                MovingObstacle(200, 610, 35, 35, "patrol", speed=2),
-                MovingObstacle(400, 610, 35, 35, "patrol", speed=1.5),
-                MovingObstacle(500, 340, 30, 30, "floating"),
-                MovingObstacle(700, 240, 30, 30, "floating"),
-                MovingObstacle(800, 610, 35, 35, "patrol", speed=2.5)
-            ])
-
-            for i in range(8):
-                collectible = Collectible(200 + i * 120, 450 - i * 25)
-                self.collectibles.append(collectible)
-
-            self.power_ups.extend([
-                PowerUp(300, 450, "jump"),
-                PowerUp(600, 320, "speed"),
-                PowerUp(800, 220, "attack")
-            ])
-
-            self.lord_zing = LordZing(1000, 100)
-            self.friend = Friend(1050, 150)
-
-        elif level == 3:  # Hard
-            self.platforms.extend([
-                Platform(100, 600, 60, 15),
-                Platform(250, 520, 50, 15),
-                Platform(400, 440, 50, 15),
-                Platform(550, 360, 50, 15),
-                Platform(700, 280, 50, 15),
-                Platform(850, 200, 50, 15),
-                Platform(1000, 120, 80, 15)
-            ])
-
-            self.moving_platforms.extend([
-                MovingPlatform(180, 570, 60, 15, speed=3, range_limit=80),
-                MovingPlatform(320, 490, 60, 15, speed=2.5, range_limit=100),
-                MovingPlatform(470, 410, 60, 15, speed=3.5, range_limit=70),
-                MovingPlatform(620, 330, 60, 15, speed=3, range_limit=90),
-                MovingPlatform(770, 250, 60, 15, speed=2.8, range_limit=85),
-                MovingPlatform(920, 170, 60, 15, speed=3.2, range_limit=75)
-            ])
-
-            self.obstacles.extend([
-                MovingObstacle(150, 610, 35, 35, "patrol", speed=3),
-                MovingObstacle(300, 610, 35, 35, "patrol", speed=2.5),
-                MovingObstacle(450, 610, 35, 35, "patrol", speed=3.5),
-                MovingObstacle(350, 450, 30, 30, "floating"),
-                MovingObstacle(500, 370, 30, 30, "floating"),
-                MovingObstacle(650, 290, 30, 30, "floating"),
-                MovingObstacle(800, 210, 30, 30, "floating"),
-                MovingObstacle(600, 610, 35, 35, "patrol", speed=4),
-                MovingObstacle(750, 610, 35, 35, "patrol", speed=3.2)
-            ])
-
-            for i in range(12):
-                collectible = Collectible(150 + i * 80, 500 - i * 20)
-                self.collectibles.append(collectible)
-
-            self.power_ups.extend([
-                PowerUp(200, 480, "jump"),
-                PowerUp(400, 380, "speed"),
-                PowerUp(600, 280, "attack"),
-                PowerUp(800, 180, "jump")
-            ])
-
-            self.lord_zing = LordZing(1050, 80)
-            self.friend = Friend(1100, 90)
+        # Level files come from the parsed-level cache on repeat loads
+        description = self.levels.load(level)
+        self.level_name = description.name
+        self.time_limit = description.time_limit
+        self.level_width = description.width
+        self.player.world_width = description.width
+
+        # Entities are built chunk by chunk; the boss and friend always exist
+        self.stream = LevelStream(description, self.build_entity)
+        self.stream.update(self.stream_views(), self.level_frames)
+        self.lord_zing = LordZing(*description.lord_zing)
+        self.friend = Friend(*description.friend)
+        self.refresh_entities()
+
+    def build_entity(self, kind, params):
+        if kind == "platforms":
+            return Platform(*params)
+        if kind == "moving_platforms":
+            x, y, width, height, speed, direction, range_limit = params
+            return MovingPlatform(x, y, width, height, speed=speed, direction=direction,
+                                  range_limit=range_limit)
+        if kind == "obstacles":
+            x, y, width, height, obstacle_type, speed = params
+            return MovingObstacle(x, y, width, height, obstacle_type, speed=speed)
+        if kind == "collectibles":
+            return Collectible(*params)
+        return PowerUp(*params)
+
+    def stream_views(self):
+        # Left edges of the camera's view and of a view centred on the player,
+        # who can be far from the camera right after respawning
+        return -int(self.camera_offset), self.player.rect.x - SCREEN_WIDTH // 3
+
+    def stream_level(self):
+        if self.stream.update(self.stream_views(), self.level_frames):
+            self.refresh_entities()
+        elif self.level_layer is not None:
+            first, last = self.stream.window(-int(self.camera_offset), CHUNK_LOAD_MARGIN)
+            if first < self.layer_chunks[0] or last > self.layer_chunks[1]:
+                self.level_layer = None
+
+    def refresh_entities(self):
+        # Entity lists and every index over them follow the loaded chunks
+        stream = self.stream
+        self.platforms[:] = stream.loaded("platforms")
+        self.moving_platforms[:] = stream.loaded("moving_platforms")
+        self.obstacles[:] = stream.loaded("obstacles")
+        self.collectibles[:] = stream.loaded("collectibles")
+        self.power_ups[:] = stream.loaded("power_ups")
+
+        self.build_visibility()
+        self.build_collision_grids()
+        self.active = {
+            "collectibles": ActiveSet(self.collectibles),
+            "power_ups": ActiveSet(self.power_ups),
+        }
+        self.colliders = ColliderSet(self.platforms, self.moving_platforms)
+
+        # Static geometry only changes with the loaded chunks, so it is drawn once per load
+        self.level_layer = None
+        if not self.headless:
+            self.bake_level_layer()
+
+    def build_collision_grids(self):
+        self.grids = {
+            "obstacles": SpatialHash(),
+            "collectibles": SpatialHash(),
+            "power_ups": SpatialHash(),
+        }
+        for kind, entities in (("obstacles", self.obstacles),
+                               ("collectibles", self.collectibles),
+                               ("power_ups", self.power_ups)):
+            for entity in entities:
+                self.grids[kind].insert(entity)
+
+        # Only patrols move, so only they need re-bucketing each frame
+        self.moving_obstacles = [obstacle for obstacle in self.obstacles if obstacle.type == "patrol"]
+
+        # Movers that stay loaded keep turning the way the old arrays left them
+        if self.movers:
+            self.movers.store_directions()
+        self.movers = None
+        use_arrays = self.mover_arrays
+        if use_arrays is None:
+            use_arrays = len(self.moving_platforms) + len(self.moving_obstacles) >= MOVER_ARRAY_THRESHOLD
+        if use_arrays:
+            self.movers = MoverArrays(self.moving_platforms, self.moving_obstacles)
+
+    def remove_entity(self, kind, entity):
+        # Collected entities leave every per-frame structure at once
+        self.stream.collect(kind, entity)
+        self.active[kind].discard(entity)
+        self.grids[kind].remove(entity)
+        self.visibility[kind].discard(entity)
+
+    def build_visibility(self):
+        self.visibility = {
+            "moving_platforms": VisibilityIndex(self.moving_platforms),
+            "obstacles": VisibilityIndex(self.obstacles),
+            "collectibles": VisibilityIndex(self.collectibles),
+            "power_ups": VisibilityIndex(self.power_ups),
+        }
+
+    def visible(self, kind, camera_x):
+        # Entities of one kind that overlap the screen at this camera position
+        return self.visibility[kind].query(-camera_x, SCREEN_WIDTH - camera_x)
+
+    def bake_level_layer(self):
+        # Only chunks near the camera are baked, so wide levels never need a level-sized surface
+        first, last = self.layer_chunks = self.stream.window(-int(self.camera_offset), CHUNK_EVICT_MARGIN)
+        rects = [platform.rect for platform in self.platforms]
+        bounds = rects[0].unionall(rects) if rects else pygame.Rect(0, 0, 0, 0)
+        left = first * CHUNK_WIDTH if first > 0 else bounds.left
+        right = (last + 1) * CHUNK_WIDTH if last < self.stream.last_chunk else bounds.right
+        bounds = bounds.clip(pygame.Rect(left, bounds.top, right - left, bounds.height))
+
+        layer = pygame.Surface(bounds.size, pygame.SRCALPHA)
+        for platform in self.platforms:
+            rect = platform.rect.move(-bounds.x, -bounds.y)
+            pygame.draw.rect(layer, platform.color, rect)
+            pygame.draw.rect(layer, BLACK, rect, 2)
+
+        if pygame.display.get_surface():
+            layer = layer.convert_alpha()
+        self.level_layer = layer
+        self.level_layer_rect = bounds
+
+    def elapsed_time(self):
+        # Level time is counted in simulation steps so headless runs and replays agree
+        return self.level_frames * SIM_STEP
+
+    def start_level(self, level, seed=None):
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.rng = random.Random(self.seed)
+        self.pending_input = InputState()
+        self.current_level = level
+        self.reset_game()
+        self.state = "game"
 
-    def update_camera(self):
+    def seek(self, frame):
+        """Move the scripted entities to where they are `frame` steps after the level start.
+
+        Platforms, patrols and Lord Zing are placed in closed form; the
+        player, pickups and score are left as they are. Frames count
+        single-frame steps.
+        """
+        self.level_frames = frame
+        for mover in self.moving_platforms + self.moving_obstacles:
+            mover.rect.x, mover.direction = mover.motion_at(frame)
+        for obstacle in self.moving_obstacles:
+            self.grids["obstacles"].update(obstacle)
+        if self.movers:
+            self.movers = MoverArrays(self.moving_platforms, self.moving_obstacles)
+        self.colliders.resort()
+
+        if self.lord_zing and not self.lord_zing.defeated:
+            self.lord_zing.seek(frame)
+        if self.friend:
+            self.friend.seek(frame)
+
+    def start_recording(self):
+        self.recorder = InputRecorder(self)
+        return self.recorder
+
+    def state_checksum(self):
+        state = (
+            self.state, self.current_level, self.level_frames, self.camera_offset,
+            tuple(self.player.rect), self.player.vel_x, self.player.vel_y,
+            self.player.lives, self.player.score,
+            self.player.projectiles.records(),
+            tuple(tuple(platform.rect) for platform in self.moving_platforms),
+            tuple(tuple(obstacle.rect) for obstacle in self.obstacles),
+            tuple(collectible.collected for collectible in self.collectibles),
+            tuple(power_up.collected for power_up in self.power_ups),
+            self.lord_zing.health if self.lord_zing else None,
+        )
+        return zlib.crc32(repr(state).encode())
+
+    def update_camera(self, dt=1):
         # Follow player with smooth camera
         target_offset = -self.player.rect.x + SCREEN_WIDTH // 3
-        self.camera_offset += (target_offset - self.camera_offset) * 0.1
+        smoothing = CAMERA_SMOOTHING if dt == 1 else 1 - (1 - CAMERA_SMOOTHING) ** dt
+        self.camera_offset += (target_offset - self.camera_offset) * smoothing
 
         # Add screen shake
         if self.screen_shake > 0:
-            self.camera_offset += random.randint(-self.screen_shake, self.screen_shake)
+            self.camera_offset += self.rng.randint(-self.screen_shake, self.screen_shake)
             self.screen_shake -= 1
 
     def handle_events(self):
@@ -541,32 +1816,37 @@ class Game:
             if event.type == pygame.QUIT:
                 return False
 
+            elif event.type == pygame.WINDOWEXPOSED:
+                self.dirty.invalidate()
+
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_SPACE:
                     if self.state == "game":
-                        self.player.jump()
+                        self.pending_input.jump = True
                     elif self.state == "menu":
                         self.state = "level_select"
                 elif event.key == pygame.K_r and self.state == "game_over":
                     self.restart_level()
                 elif event.key == pygame.K_ESCAPE:
                     self.state = "menu"
+                elif event.key in (pygame.K_LEFT, pygame.K_RIGHT) and self.state == "level_select":
+                    step = 1 if event.key == pygame.K_RIGHT else -1
+                    page = self.level_page + step
+                    if 0 <= page and page * self.LEVELS_PER_PAGE < self.level_count:
+                        self.level_page = page
+                        self.dirty.invalidate()
+                elif event.key == pygame.K_F3:
+                    self.show_debug = not self.show_debug
+                    self.dirty.invalidate()
                 if event.key == pygame.K_RETURN:
                     if self.state == "game":
-                        self.player.shoot()
+                        self.pending_input.shoot = True
 
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if self.state == "game":
                     if event.button == 1:
-                        self.player.jump()
-
-                    # Attack Lord Zing if close enough
-                    if (event.button == 1 and self.lord_zing and
-                            abs(self.player.rect.centerx - self.lord_zing.rect.centerx) < 100):
-                        self.lord_zing.take_damage()
-                        self.screen_shake = 10
-                        if self.lord_zing.defeated:
-                            self.friend.rescue()
+                        self.pending_input.jump = True
+                        self.pending_input.attack = True
 
                 # Menu interactions
                 if self.state == "menu":
@@ -575,12 +1855,9 @@ class Game:
                         self.state = "level_select"
 
                 elif self.state == "level_select":
-                    for i in range(3):
-                        level_button = pygame.Rect(400 + i * 120, 300, 100, 60)
+                    for number, level_button in self.level_buttons():
                         if level_button.collidepoint(event.pos):
-                            self.current_level = i + 1
-                            self.reset_game()
-                            self.state = "game"
+                            self.start_level(number)
 
                 elif self.state in ["game_over", "victory"]:
                     restart_button = pygame.Rect(SCREEN_WIDTH // 2 - 100, 400, 200, 60)
@@ -593,107 +1870,209 @@ class Game:
 
         return True
 
+    def poll_input(self):
+        # Held controls come from the devices, one-shot actions from queued events
+        inputs = InputState.from_devices()
+        inputs.jump = self.pending_input.jump
+        inputs.attack = self.pending_input.attack
+        inputs.shoot = self.pending_input.shoot
+        self.pending_input = InputState()
+        return inputs
+
+    def apply_actions(self, inputs):
+        if inputs.jump:
+            self.player.jump()
+
+        # Attack Lord Zing if close enough
+        if (inputs.attack and self.lord_zing and
+                abs(self.player.rect.centerx - self.lord_zing.rect.centerx) < 100):
+            self.lord_zing.take_damage()
+            self.screen_shake = 10
+            if self.lord_zing.defeated:
+                self.friend.rescue()
+
+        if inputs.shoot:
+            self.player.shoot()
+
     def restart_level(self):
         self.game_stats["deaths"] += 1
         self.reset_game()
         self.state = "game"
 
-    def update(self):
+    def update(self, controls=None, dt=1):
         if self.state == "game":
+            self.level_frames += dt
             self.background.update()
-            self.update_camera()
+            self.update_camera(dt)
+            self.stream_level()
 
             # Update all game objects
-            self.player.update(self.platforms + self.moving_platforms)
+            self.player.update(self.colliders, controls, dt)
 
-            for platform in self.moving_platforms:
-                platform.update()
+            if self.movers:
+                self.update_mover_arrays(dt)
+            else:
+                for platform in self.moving_platforms:
+                    platform.update(dt)
+                self.colliders.resort()
 
-            for obstacle in self.obstacles:
-                obstacle.update()
+                for obstacle in self.obstacles:
+                    obstacle.update(dt)
+                for obstacle in self.moving_obstacles:
+                    self.grids["obstacles"].update(obstacle)
 
-            for collectible in self.collectibles:
+            for collectible in self.active["collectibles"]:
                 collectible.update()
 
-            for power_up in self.power_ups:
+            for power_up in self.active["power_ups"]:
                 power_up.update()
 
-            if self.lord_zing:
-                self.lord_zing.update()
+            if self.lord_zing and not self.lord_zing.defeated:
+                self.lord_zing.update(dt)
 
             if self.friend:
-                self.friend.update()
+                self.friend.update(dt)
 
             # Update projectiles
-            self.player.update_projectiles()
+            self.player.update_projectiles(dt)
 
             # Check obstacle collisions
-            for obstacle in self.obstacles:
-                if self.player.rect.colliderect(obstacle.rect):
-                    self.player.lives -= 1
-                    self.screen_shake = 15
-                    if self.player.lives <= 0:
-                        self.state = "game_over"
-                        self.game_stats["time_taken"] = time.time() - self.start_time
-                    else:
-                        # Reset player position
-                        self.player.rect.x = 50
-                        self.player.rect.y = 500
-                        self.player.vel_y = 0
-                        self.player.vel_x = 0
+            hits = self.grids["obstacles"].query(self.player.rect)
+            while hits:
+                obstacle = hits.pop(0)
+                self.player.lives -= 1
+                self.screen_shake = 15
+                if self.player.lives <= 0:
+                    self.state = "game_over"
+                    self.game_stats["time_taken"] = self.elapsed_time()
+                else:
+                    # Reset player position
+                    self.player.rect.x = 50
+                    self.player.rect.y = 500
+                    self.player.vel_y = 0
+                    self.player.vel_x = 0
+                    # Later obstacles are checked against the respawned player
+                    hits = self.grids["obstacles"].query(self.player.rect, after=obstacle)
 
             # Check collectible collisions
-            for collectible in self.collectibles:
-                if not collectible.collected and self.player.rect.colliderect(collectible.rect):
-                    collectible.collected = True
-                    self.player.score += 100
-                    self.game_stats["coins_collected"] += 1
+            for collectible in self.grids["collectibles"].query(self.player.rect):
+                collectible.collected = True
+                self.remove_entity("collectibles", collectible)
+                self.player.score += 100
+                self.game_stats["coins_collected"] += 1
 
             # Check power-up collisions
-            for power_up in self.power_ups:
-                if not power_up.collected and self.player.rect.colliderect(power_up.rect):
-                    power_up.collected = True
-                    self.player.score += 200
-                    # Apply power-up effect temporarily
-                    if power_up.type == "speed":
-                        self.player.speed = PLAYER_SPEED * 2
-                    elif power_up.type == "jump":
-                        self.player.jump()
+            for power_up in self.grids["power_ups"].query(self.player.rect):
+                power_up.collected = True
+                self.remove_entity("power_ups", power_up)
+                self.player.score += 200
+                # Apply power-up effect temporarily
+                if power_up.type == "speed":
+                    self.player.speed = PLAYER_SPEED * 2
+                elif power_up.type == "jump":
+                    self.player.jump()
 
             # Check if friend is rescued (level completion)
             if self.friend and self.friend.rescued:
-                if self.current_level < 3:
+                if self.current_level < self.level_count:
                     self.current_level += 1
                     self.reset_game()
                 else:
                     self.state = "victory"
-                    self.game_stats["time_taken"] = time.time() - self.start_time
+                    self.game_stats["time_taken"] = self.elapsed_time()
 
             # Check time limit
-            elapsed_time = time.time() - self.start_time
-            if elapsed_time > LEVEL_TIME_LIMITS[self.current_level]:
+            elapsed_time = self.elapsed_time()
+            if elapsed_time > self.time_limit:
                 self.player.lives = 0
                 self.state = "game_over"
                 self.game_stats["time_taken"] = elapsed_time
 
             # Check projectile hits on Lord Zing
             if self.lord_zing and not self.lord_zing.defeated:
-                for proj in self.player.projectiles[:]:
-                    if abs(proj['x'] - (self.lord_zing.rect.x + self.camera_offset)) < 50:
-                        self.lord_zing.take_damage()
-                        proj['hit'] = True
-                        self.screen_shake = 10
-                        if self.lord_zing.defeated:
-                            self.friend.rescue()
+                # Every projectile in reach, including ones already stuck, deals damage
+                hits = self.player.projectiles.strike(self.lord_zing.rect.x + self.camera_offset, 50)
+                for _ in range(hits):
+                    self.lord_zing.take_damage()
+                if hits:
+                    self.screen_shake = 10
+                    if self.lord_zing.defeated:
+                        self.friend.rescue()
+
+    def update_mover_arrays(self, dt=1):
+        movers = self.movers
+        previous = movers.update(dt)
+        self.colliders.resort(movers.platform_x)
+
+        # Only patrols whose left or right edge crossed a cell boundary need re-bucketing
+        grid = self.grids["obstacles"]
+        size = grid.cell_size
+        widths = movers.patrol_width
+        x = movers.patrol_x
+        crossed = ((previous // size != x // size) |
+                   ((previous + widths - 1) // size != (x + widths - 1) // size))
+        for i in np.flatnonzero(crossed).tolist():
+            grid.update(self.moving_obstacles[i])
+
+    def tracked_rects(self):
+        # Rects that move during a simulation step and get interpolated when drawn
+        rects = [self.player.rect]
+        rects.extend(platform.rect for platform in self.moving_platforms)
+        rects.extend(obstacle.rect for obstacle in self.obstacles)
+        if self.lord_zing:
+            rects.append(self.lord_zing.rect)
+        return rects
+
+    def save_previous_positions(self):
+        self.previous_positions = [(rect, rect.x, rect.y) for rect in self.tracked_rects()]
+        self.previous_camera = self.camera_offset
+
+    def draw_game_interpolated(self, alpha):
+        # Draw the game blended between the previous and current simulation step
+        current_positions = [(rect, rect.x, rect.y) for rect, _, _ in self.previous_positions]
+        current_camera = self.camera_offset
+
+        for rect, prev_x, prev_y in self.previous_positions:
+            rect.x = prev_x + (rect.x - prev_x) * alpha
+            rect.y = prev_y + (rect.y - prev_y) * alpha
+        self.camera_offset = self.previous_camera + (current_camera - self.previous_camera) * alpha
+
+        self.draw_game()
+
+        for rect, x, y in current_positions:
+            rect.x = x
+            rect.y = y
+        self.camera_offset = current_camera
+
+    def draw_background(self, name):
+        # Backgrounds are baked once per screen size and blitted whole
+        size = self.screen.get_size()
+        key = (name, size)
+        if key not in self.background_cache:
+            self.background_cache[key] = self.build_background(name, size)
+        self.screen.blit(self.background_cache[key], (0, 0))
+
+    def build_background(self, name, size):
+        width, height = size
+        top, bottom, weight = BACKGROUNDS[name]
+
+        if bottom is None:
+            surface = pygame.Surface(size)
+            surface.fill(top)
+        else:
+            # One column of row colors, stretched across the screen
+            ratio = np.arange(height)[:, None] / height
+            colors = (np.array(top) * (1 - ratio) + np.array(bottom) * ratio * weight).astype(np.uint8)
+            column = pygame.surfarray.make_surface(colors[None, :, :])
+            surface = pygame.transform.scale(column, size)
+
+        if pygame.display.get_surface():
+            surface = surface.convert()
+        return surface
 
     def draw_menu(self):
         # Simple gradient background
-        for y in range(SCREEN_HEIGHT):
-            color_ratio = y / SCREEN_HEIGHT
-            r = int(DEEP_BLUE[0] * (1 - color_ratio) + FOREST_GREEN[0] * color_ratio)
-            g = int(DEEP_BLUE[1] * (1 - color_ratio) + FOREST_GREEN[1] * color_ratio)
-            b = int(DEEP_BLUE[2] * (1 - color_ratio) + FOREST_GREEN[2] * color_ratio)
-            pygame.draw.line(self.screen, (r, g, b), (0, y), (SCREEN_WIDTH, y))
+        self.draw_background("menu")
 
         self.background.draw(self.screen)
 
@@ -728,227 +2107,203 @@ class Game:
 
     def draw_level_select(self):
         # Simple background
-        for y in range(SCREEN_HEIGHT):
-            color_ratio = y / SCREEN_HEIGHT
-            r = int(DEEP_BLUE[0] * (1 - color_ratio) + FOREST_GREEN[0] * color_ratio)
-            g = int(DEEP_BLUE[1] * (1 - color_ratio) + FOREST_GREEN[1] * color_ratio)
-            b = int(DEEP_BLUE[2] * (1 - color_ratio) + FOREST_GREEN[2] * color_ratio)
-            pygame.draw.line(self.screen, (r, g, b), (0, y), (SCREEN_WIDTH, y))
+        self.draw_background("level_select")
 
         # Title
         title_text = self.font.render("SELECT LEVEL", True, WHITE)
         title_rect = title_text.get_rect(center=(SCREEN_WIDTH // 2, 150))
         self.screen.blit(title_text, title_rect)
 
-        # Level buttons
-        level_names = ["EASY", "MEDIUM", "HARD"]
-        level_times = ["120s", "90s", "60s"]
+        # Page hint when the levels don't fit on one page
+        if self.level_count > self.LEVELS_PER_PAGE:
+            page = f"PAGE {self.level_page + 1}"
+            if self.level_count != math.inf:
+                page += f"/{math.ceil(self.level_count / self.LEVELS_PER_PAGE)}"
+            page_text = self.small_font.render(f"<  {page}  >", True, WHITE)
+            self.screen.blit(page_text, page_text.get_rect(center=(SCREEN_WIDTH // 2, 220)))
 
-        for i in range(3):
-            x = 400 + i * 120
-            y = 300
+        # Level buttons, named and timed by the game's level source
+        for number, button_rect in self.level_buttons():
+            description = self.levels.load(number)
+            x, y = button_rect.topleft
 
-            button_rect = pygame.Rect(x, y, 100, 60)
             pygame.draw.rect(self.screen, GRAY, button_rect, border_radius=10)
             pygame.draw.rect(self.screen, WHITE, button_rect, 3, border_radius=10)
 
             # Level number
-            level_text = self.font.render(str(i + 1), True, WHITE)
+            level_text = self.font.render(str(number), True, WHITE)
             level_rect = level_text.get_rect(center=(x + 50, y + 20))
             self.screen.blit(level_text, level_rect)
 
             # Difficulty
-            diff_text = self.small_font.render(level_names[i], True, WHITE)
+            diff_text = fit_text(self.small_font, description.name.upper(), WHITE, 116)
             diff_rect = diff_text.get_rect(center=(x + 50, y + 45))
             self.screen.blit(diff_text, diff_rect)
 
             # Time limit
-            time_text = self.small_font.render(level_times[i], True, YELLOW)
+            time_text = self.small_font.render(f"{description.time_limit}s", True, YELLOW)
             time_rect = time_text.get_rect(center=(x + 50, y + 80))
             self.screen.blit(time_text, time_rect)
 
+    def level_buttons(self):
+        # (level number, button rect) for each level on the current level select page
+        first = self.level_page * self.LEVELS_PER_PAGE + 1
+        numbers = range(first, int(min(self.level_count, first + self.LEVELS_PER_PAGE - 1)) + 1)
+        buttons = []
+        for i, number in enumerate(numbers):
+            row, column = divmod(i, self.LEVEL_BUTTON_COLUMNS)
+            in_row = min(len(numbers) - row * self.LEVEL_BUTTON_COLUMNS, self.LEVEL_BUTTON_COLUMNS)
+            x = SCREEN_WIDTH // 2 - (in_row * 120 - 20) // 2 + column * 120
+            buttons.append((number, pygame.Rect(x, 300 + row * 100, 100, 60)))
+        return buttons
+
     def draw_game(self):
         # Simple sky background
-        for y in range(SCREEN_HEIGHT):
-            color_ratio = y / SCREEN_HEIGHT
-            r = int(DEEP_BLUE[0] * (1 - color_ratio) + FOREST_GREEN[0] * color_ratio * 0.3)
-            g = int(DEEP_BLUE[1] * (1 - color_ratio) + FOREST_GREEN[1] * color_ratio * 0.3)
-            b = int(DEEP_BLUE[2] * (1 - color_ratio) + FOREST_GREEN[2] * color_ratio * 0.3)
-            pygame.draw.line(self.screen, (r, g, b), (0, y), (SCREEN_WIDTH, y))
+        self.draw_background("game")
 
         self.background.draw(self.screen)
 
         # Apply camera offset to all drawn objects
         camera_x = int(self.camera_offset)
 
-        # Draw platforms
-        for platform in self.platforms:
-            draw_rect = pygame.Rect(platform.rect.x + camera_x, platform.rect.y,
-                                    platform.rect.width, platform.rect.height)
-            pygame.draw.rect(self.screen, platform.color, draw_rect)
-            pygame.draw.rect(self.screen, BLACK, draw_rect, 2)
+        # A scrolling camera moves every pixel on screen
+        self.dirty.clear()
+        if camera_x != self.drawn_camera:
+            self.dirty.invalidate()
+            self.drawn_camera = camera_x
+
+        # Draw platforms from the baked layer, copying only the visible window
+        if self.level_layer is None:
+            self.bake_level_layer()
+        layer_rect = self.level_layer_rect
+        view = pygame.Rect(-camera_x, 0, SCREEN_WIDTH, SCREEN_HEIGHT).clip(layer_rect)
+        if view:
+            self.screen.blit(self.level_layer, (view.x + camera_x, view.y),
+                             view.move(-layer_rect.x, -layer_rect.y))
 
         # Draw moving platforms
-        for platform in self.moving_platforms:
+        for platform in self.visible("moving_platforms", camera_x):
             draw_rect = pygame.Rect(platform.rect.x + camera_x, platform.rect.y,
                                     platform.rect.width, platform.rect.height)
-            pygame.draw.rect(self.screen, platform.color, draw_rect)
+            self.dirty.add(pygame.draw.rect(self.screen, platform.color, draw_rect))
             pygame.draw.rect(self.screen, BLACK, draw_rect, 2)
 
         # Draw obstacles
-        for obstacle in self.obstacles:
-            if obstacle.type == "patrol":
-                draw_rect = pygame.Rect(obstacle.rect.x + camera_x, obstacle.rect.y,
-                                        obstacle.rect.width, obstacle.rect.height)
-                pygame.draw.rect(self.screen, RED, draw_rect, border_radius=5)
-                # Simple eyes
-                pygame.draw.circle(self.screen, BLACK,
-                                   (draw_rect.x + 10, draw_rect.y + 10), 4)
-                pygame.draw.circle(self.screen, BLACK,
-                                   (draw_rect.x + 25, draw_rect.y + 10), 4)
-
-            elif obstacle.type == "floating":
-                points = [
-                    (obstacle.rect.x + camera_x, obstacle.rect.bottom),
-                    (obstacle.rect.x + camera_x + obstacle.rect.width // 2, obstacle.rect.y),
-                    (obstacle.rect.x + camera_x + obstacle.rect.width, obstacle.rect.bottom)
-                ]
-                pygame.draw.polygon(self.screen, DARK_RED, points)
+        for obstacle in self.visible("obstacles", camera_x):
+            self.dirty.add(self.screen.blit(obstacle.sprite(), (obstacle.rect.x + camera_x, obstacle.rect.y)))
 
         # Draw collectibles
-        for collectible in self.collectibles:
-            if not collectible.collected:
-                draw_x = collectible.rect.x + camera_x
-                if -50 < draw_x < SCREEN_WIDTH + 50:
-                    draw_rect = pygame.Rect(draw_x, collectible.rect.y,
-                                          collectible.rect.width, collectible.rect.height)
-                    pygame.draw.ellipse(self.screen, YELLOW, draw_rect)
-                    pygame.draw.ellipse(self.screen, BLACK, draw_rect, 2)
+        for collectible in self.visible("collectibles", camera_x):
+            draw_x = collectible.rect.x + camera_x
+            self.dirty.add(self.screen.blit(collectible.sprite(), (draw_x, collectible.rect.y)))
 
         # Draw power-ups
-        for power_up in self.power_ups:
-            if not power_up.collected:
-                draw_x = power_up.rect.x + camera_x
-                if -50 < draw_x < SCREEN_WIDTH + 50:
-                    draw_rect = pygame.Rect(draw_x, power_up.rect.y,
-                                            power_up.rect.width, power_up.rect.height)
-                    if power_up.type == "speed":
-                        color = (0, 255, 255)
-                    elif power_up.type == "jump":
-                        color = (255, 255, 0)
-                    elif power_up.type == "attack":
-                        color = (255, 0, 0)
-                    pygame.draw.rect(self.screen, color, draw_rect, border_radius=15)
+        for power_up in self.visible("power_ups", camera_x):
+            draw_x = power_up.rect.x + camera_x
+            self.dirty.add(self.screen.blit(power_up.sprite(), (draw_x, power_up.rect.y)))
 
         # Draw Lord Zing
-        if self.lord_zing:
+        if self.lord_zing and not self.lord_zing.defeated:
             draw_x = self.lord_zing.rect.x + camera_x
-            if -100 < draw_x < SCREEN_WIDTH + 100:
-                draw_rect = pygame.Rect(draw_x, self.lord_zing.rect.y,
-                                        self.lord_zing.rect.width, self.lord_zing.rect.height)
-
-                if not self.lord_zing.defeated:
-                    # Lord Zing body
-                    pygame.draw.rect(self.screen, PURPLE, draw_rect, border_radius=10)
-                    # Simple eyes
-                    pygame.draw.circle(self.screen, RED,
-                                       (draw_rect.x + 20, draw_rect.y + 25), 8)
-                    pygame.draw.circle(self.screen, RED,
-                                       (draw_rect.x + 60, draw_rect.y + 25), 8)
-                    # Health bars
-                    for i in range(self.lord_zing.health):
-                        pygame.draw.circle(self.screen, RED,
-                                           (draw_rect.x + 10 + i * 20, draw_rect.y - 20), 8)
+            if -self.lord_zing.rect.width < draw_x < SCREEN_WIDTH:
+                self.dirty.add(self.screen.blit(self.lord_zing.sprite(),
+                                                (draw_x, self.lord_zing.rect.y - LordZing.SPRITE_TOP)))
 
         # Draw Friend
         if self.friend:
             draw_x = self.friend.rect.x + camera_x
             if -100 < draw_x < SCREEN_WIDTH + 100:
-                draw_rect = pygame.Rect(draw_x, self.friend.rect.y,
-                                        self.friend.rect.width, self.friend.rect.height)
-
                 # Draw cage if not rescued
                 if not self.friend.rescued:
-                    for bar in self.friend.cage_bars:
-                        bar_rect = pygame.Rect(bar.x + camera_x, bar.y, bar.width, bar.height)
-                        pygame.draw.rect(self.screen, GRAY, bar_rect)
+                    cage = self.friend.cage_bars[0]
+                    self.dirty.add(self.screen.blit(self.friend.cage_sprite(), (cage.x + camera_x, cage.y)))
 
                 # Draw friend
-                color = LIGHT_BLUE if not self.friend.rescued else (0, 255, 0)
-                pygame.draw.rect(self.screen, color, draw_rect, border_radius=8)
-
-                # Eyes
-                if not self.friend.rescued:
-                    pygame.draw.ellipse(self.screen, BLACK,
-                                        (draw_rect.x + 8, draw_rect.y + 12, 8, 12))
-                    pygame.draw.ellipse(self.screen, BLACK,
-                                        (draw_rect.x + 22, draw_rect.y + 12, 8, 12))
-                else:
-                    pygame.draw.circle(self.screen, BLACK,
-                                       (draw_rect.x + 12, draw_rect.y + 15), 4)
-                    pygame.draw.circle(self.screen, BLACK,
-                                       (draw_rect.x + 23, draw_rect.y + 15), 4)
-                    pygame.draw.arc(self.screen, BLACK,
-                                    (draw_rect.x + 5, draw_rect.y + 25, 25, 20), 0, 3.14, 3)
+                self.dirty.add(self.screen.blit(self.friend.sprite(), (draw_x, self.friend.rect.y)))
 
         # Draw player with camera offset
-        self.player.draw(self.screen, camera_x)
+        self.dirty.extend(self.player.draw(self.screen, camera_x))
 
         # Draw UI
         self.draw_ui()
 
+        if self.show_debug:
+            self.draw_debug_overlay()
+
     def draw_ui(self):
+        hud = self.hud
+
         # UI background
-        ui_surface = pygame.Surface((300, 140))
-        ui_surface.set_alpha(180)
-        ui_surface.fill(DEEP_BLUE)
-        self.screen.blit(ui_surface, (10, 10))
+        ui_rect = self.screen.blit(hud.panel, (10, 10))
+        values = (self.player.lives, self.player.score, self.current_level)
+        if values != self.drawn_hud:
+            self.dirty.add(ui_rect)
+            self.drawn_hud = values
 
         # Lives with hearts
-        lives_text = self.small_font.render("Lives:", True, WHITE)
-        self.screen.blit(lives_text, (20, 20))
-        for i in range(self.player.lives):
-            heart_x = 80 + i * 25
-            pygame.draw.polygon(self.screen, RED, [
-                (heart_x, 30), (heart_x + 5, 25), (heart_x + 10, 25),
-                (heart_x + 15, 30), (heart_x + 15, 35), (heart_x + 7.5, 42), (heart_x, 35)
-            ])
+        self.screen.blit(hud.lives_label, (20, 20))
+        hearts, _ = hud.field("lives", self.player.lives, hud.render_hearts)
+        self.screen.blit(hearts, (80, 25))
 
         # Score
-        score_text = self.small_font.render(f"Score: {self.player.score}", True, YELLOW)
+        score_text, _ = hud.field("score", self.player.score,
+                                  lambda score: self.small_font.render(f"Score: {score}", True, YELLOW))
         self.screen.blit(score_text, (20, 55))
 
         # Level
-        level_text = self.small_font.render(f"Level: {self.current_level}", True, WHITE)
+        level_text, _ = hud.field("level", self.current_level,
+                                  lambda level: self.small_font.render(f"Level: {level}", True, WHITE))
         self.screen.blit(level_text, (20, 90))
 
         # Timer
-        elapsed_time = time.time() - self.start_time
-        remaining_time = max(0, LEVEL_TIME_LIMITS[self.current_level] - elapsed_time)
+        elapsed_time = self.elapsed_time()
+        remaining_time = max(0, self.time_limit - elapsed_time)
         timer_color = RED if remaining_time < 20 else WHITE
 
-        timer_text = self.small_font.render(f"Time: {remaining_time:.1f}s", True, timer_color)
-        self.screen.blit(timer_text, (SCREEN_WIDTH - 150, 20))
+        timer_text, changed = hud.field("timer", (f"Time: {remaining_time:.1f}s", timer_color),
+                                        lambda value: self.small_font.render(value[0], True, value[1]))
+        timer_rect = self.screen.blit(timer_text, (SCREEN_WIDTH - 150, 20))
+        if changed:
+            # Narrower text leaves the old text's tail to clear as well
+            self.dirty.add(timer_rect)
+            if self.drawn_timer is not None:
+                self.dirty.add(self.drawn_timer)
+            self.drawn_timer = timer_rect
 
         # Controls
-        controls = [
-            "Hold MOUSE: Run",
-            "CLICK/SPACE: Jump", 
-            "Press ENTER to Shoot"
+        for i, control_surface in enumerate(hud.controls):
+            self.screen.blit(control_surface, (SCREEN_WIDTH - 250, 60 + i * 25))
+
+    def draw_debug_overlay(self):
+        if self.debug_atlas is None:
+            self.debug_atlas = GlyphAtlas(pygame.font.Font(None, 22), WHITE)
+            self.debug_panel = pygame.Surface((260, 230))
+            self.debug_panel.set_alpha(160)
+            self.debug_panel.fill(BLACK)
+
+        player = self.player
+        lines = [
+            ("FPS: ", f"{self.clock.get_fps():.1f}"),
+            ("Frame ms: ", str(self.clock.get_time())),
+            ("Level frame: ", str(self.level_frames)),
+            ("Player: ", f"{player.rect.x}, {player.rect.y}"),
+            ("Velocity: ", "%.2f, %.2f" % player.velocity()),
+            ("On ground: ", str(player.on_ground)),
+            ("Camera: ", f"{self.camera_offset:.1f}"),
+            ("Platforms: ", f"{len(self.platforms)} + {len(self.moving_platforms)} moving"),
+            ("Obstacles: ", str(len(self.obstacles))),
+            ("Coins left: ", str(len(self.active["collectibles"]))),
+            ("Projectiles: ", str(len(player.projectiles))),
         ]
 
-        for i, control in enumerate(controls):
-            control_surface = pygame.font.Font(None, 24).render(control, True, WHITE)
-            self.screen.blit(control_surface, (SCREEN_WIDTH - 250, 60 + i * 25))
+        top = SCREEN_HEIGHT - 240
+        self.dirty.add(self.screen.blit(self.debug_panel, (10, top)))
+        for i, (label, value) in enumerate(lines):
+            self.debug_atlas.draw_label(self.screen, label, value, (20, top + 10 + i * 20))
 
     def draw_game_over(self):
         # Background
-        for y in range(SCREEN_HEIGHT):
-            color_ratio = y / SCREEN_HEIGHT
-            r = int(DEEP_BLUE[0] + 20)
-            g = int(DEEP_BLUE[1])
-            b = int(DEEP_BLUE[2])
-            pygame.draw.line(self.screen, (r, g, b), (0, y), (SCREEN_WIDTH, y))
+        self.draw_background("game_over")
 
         # Game Over text
         game_over_text = self.font.render("GAME OVER!", True, RED)
@@ -974,12 +2329,7 @@ class Game:
 
     def draw_victory(self):
         # Background
-        for y in range(SCREEN_HEIGHT):
-            color_ratio = y / SCREEN_HEIGHT
-            r = int(FOREST_GREEN[0] + 20)
-            g = int(FOREST_GREEN[1] + 20)
-            b = int(FOREST_GREEN[2])
-            pygame.draw.line(self.screen, (r, g, b), (0, y), (SCREEN_WIDTH, y))
+        self.draw_background("victory")
 
         # Victory text
         victory_text = self.font.render("VICTORY!", True, YELLOW)
@@ -1028,27 +2378,66 @@ class Game:
         menu_rect = menu_text.get_rect(center=menu_button.center)
         self.screen.blit(menu_text, menu_rect)
 
+    def step(self, inputs=None, dt=1):
+        # Advance the simulation by dt frames in one step, without drawing
+        if inputs is None:
+            inputs = InputState()
+        if self.state == "game":
+            if self.recorder:
+                self.recorder.record(inputs, dt)
+            self.apply_actions(inputs)
+        self.update(inputs, dt)
+        return self.state
+
+    def run_frames(self, n, inputs=None, dt=1):
+        # Simulate up to n frames as fast as possible, stopping once the level ends
+        frames = 0
+        while frames < n and self.state == "game":
+            self.step(inputs, dt)
+            frames += dt
+        return frames
+
+    def render(self, alpha):
+        if self.state != self.drawn_state:
+            self.dirty.invalidate()
+            self.drawn_state = self.state
+        elif self.dirty_rects and self.state in self.STATIC_STATES and not self.dirty.full_redraw:
+            # Nothing on these screens changes until the state does
+            return
+
+        # Draw based on game state
+        if self.state == "menu":
+            self.draw_menu()
+        elif self.state == "level_select":
+            self.draw_level_select()
+        elif self.state == "game":
+            self.draw_game_interpolated(alpha)
+        elif self.state == "game_over":
+            self.draw_game_over()
+        elif self.state == "victory":
+            self.draw_victory()
+
+        if not self.dirty_rects:
+            self.dirty.invalidate()
+        self.dirty.present()
+
     def run(self):
         running = True
+        accumulator = 0.0
 
         while running:
+            frame_time = min(self.clock.tick(FPS) / 1000.0, MAX_FRAME_TIME)
+            accumulator += frame_time
+
             running = self.handle_events()
-            self.update()
-
-            # Draw based on game state
-            if self.state == "menu":
-                self.draw_menu()
-            elif self.state == "level_select":
-                self.draw_level_select()
-            elif self.state == "game":
-                self.draw_game()
-            elif self.state == "game_over":
-                self.draw_game_over()
-            elif self.state == "victory":
-                self.draw_victory()
 
-            pygame.display.flip()
-            self.clock.tick(FPS)
+            # Run as many fixed steps as the elapsed time covers
+            while accumulator >= SIM_STEP:
+                self.save_previous_positions()
+                self.step(self.poll_input())
+                accumulator -= SIM_STEP
+
+            self.render(accumulator / SIM_STEP)
 
         pygame.quit()
         sys.exit()
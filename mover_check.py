@@ -0,0 +1,54 @@
+# Mover storage check for Turbo Runners
+#
+# check_level() plays the same inputs through two games, one keeping
+# moving platforms and patrols in MoverArrays and one updating them as
+# objects, and compares their state checksums every frame. Generated levels
+# several screens wide stream chunks in and out as the player runs, so the
+# arrays are rebuilt mid-level while movers that stay loaded keep moving.
+#
+#     python mover_check.py [seeds...]
+#
+# checks generated levels from the given seeds (0 to 9 by default) and
+# exits with status 1 if the two games ever disagree.
+import sys
+
+from levelgen import EndlessLevels
+from main import Game, InputState
+
+SCREENS = 6
+FRAMES = 3000
+# The player runs right and jumps this often, so it crosses pits and chunks
+JUMP_INTERVAL = 25
+
+
+def inputs(frame):
+    return InputState(right=True, run=True, jump=frame % JUMP_INTERVAL == 0)
+
+
+def check_level(seed, screens=SCREENS, frames=FRAMES):
+    """First frame where array and object mover storage disagree, or None."""
+    games = [Game(headless=True, seed=seed, level_source=EndlessLevels(seed, screens), mover_arrays=arrays)
+             for arrays in (True, False)]
+    for game in games:
+        game.start_level(1, seed)
+    for frame in range(frames):
+        for game in games:
+            game.step(inputs(frame))
+        if games[0].state_checksum() != games[1].state_checksum():
+            return frame
+    return None
+
+
+def main(argv):
+    seeds = [int(seed) for seed in argv] or range(10)
+    failed = 0
+    for seed in seeds:
+        frame = check_level(seed)
+        status = "ok" if frame is None else f"DIVERGED at frame {frame}"
+        print(f"seed {seed}: {status}")
+        failed += frame is not None
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
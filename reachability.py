@@ -0,0 +1,256 @@
+# Reachability analysis for Turbo Runners levels
+#
+# analyze(description) works out which platforms the player can get to and
+# whether Lord Zing and the friend are within reach. Each platform and
+# moving platform is a node; there is an edge from one to another when a
+# jump from the first, stepped exactly as Player.update moves the player,
+# comes down on the second. Moving platforms are sampled over their period.
+# A breadth-first search from the spawn point finds every node the player
+# can stand on. Results are cached by a hash of the level's contents, and
+# analyze_files() and analyze_levels() spread many levels across a process
+# pool.
+#
+#     python reachability.py [level files...]
+#
+# checks the given files (all of levels/ by default) and exits with status
+# 1 if any of them can't be finished.
+import hashlib
+import multiprocessing as mp
+import sys
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+
+from levels import level_count, level_path, load_level
+from main import (GRAVITY, JUMP_SPEED, PLAYER_ACCELERATION, PLAYER_SPEED, SCREEN_HEIGHT, MovingPlatform,
+                  rect_coord)
+
+PLAYER_WIDTH = 40
+PLAYER_HEIGHT = 60
+SPAWN = (50, 500)
+RUN_SPEED = PLAYER_SPEED * 1.8
+# Melee attacks land within this horizontal distance of Lord Zing's center
+ATTACK_RANGE = 100
+# Lord Zing sways this far either side of where he starts
+BOSS_SWAY = 100
+BOSS_SIZE = (80, 100)
+FRIEND_SIZE = (35, 55)
+# Positions sampled over each moving platform's period, besides its turning points
+MOVER_SAMPLES = 16
+
+_cache = {}
+
+
+def jump_arc(speed):
+    """(x, rise, falling) after each frame of a jump from a standstill.
+
+    The player accelerates right towards `speed` and is stepped exactly as
+    Player.update moves it, so the arc has the same rounding as the game.
+    It ends once the player has fallen a screen below the take-off point.
+    """
+    arc = []
+    x = vel_x = 0
+    y = start = SCREEN_HEIGHT
+    vel_y = JUMP_SPEED
+    while y - start < SCREEN_HEIGHT:
+        vel_x = min(vel_x + PLAYER_ACCELERATION, speed)
+        x = rect_coord(x + vel_x)
+        vel_y += GRAVITY
+        y = rect_coord(y + vel_y)
+        arc.append((x, start - y, vel_y > 0))
+    return arc
+
+
+ARC = jump_arc(RUN_SPEED)
+MAX_REACH = ARC[-1][0]
+
+
+@lru_cache(maxsize=None)
+def landing_reach(rise, height):
+    """Furthest horizontal travel that still lands on a platform `rise`
+    pixels above the take-off point and `height` pixels thick, or None.
+
+    A falling player that overlaps a platform at all is put on top of it,
+    so the last falling frame with any overlap counts.
+    """
+    reach = None
+    for x, arc_rise, falling in ARC:
+        if falling and arc_rise < rise and arc_rise + PLAYER_HEIGHT > rise - height:
+            reach = x
+    return reach
+
+
+class Surface:
+    """Somewhere the player can stand: a platform, or a moving platform at
+    each of its sampled positions. spans are the (min, max) player x that
+    overlaps the surface at each position."""
+
+    def __init__(self, index, kind, top, height, lefts, width):
+        self.index = index
+        self.kind = kind
+        self.top = top
+        self.height = height
+        self.spans = [(left - PLAYER_WIDTH + 1, left + width - 1) for left in lefts]
+        # A player riding a moving platform can jump from anywhere it goes
+        self.low = min(low for low, _ in self.spans)
+        self.high = max(high for _, high in self.spans)
+
+
+class Reachability:
+    """What analyze() found for one level."""
+
+    def __init__(self, surfaces, reached, boss, friend):
+        self.surfaces = surfaces
+        self.reached = reached
+        self.boss = boss
+        self.friend = friend
+
+    @property
+    def completable(self):
+        return self.boss and self.friend
+
+    def unreached(self):
+        # (kind, index) of each surface the player can never stand on
+        return [(s.kind, s.index) for i, s in enumerate(self.surfaces) if i not in self.reached]
+
+
+def level_hash(description):
+    """Hash of everything in a level that reachability depends on."""
+    key = repr((description.width, description.platforms, description.moving_platforms,
+                description.lord_zing, description.friend))
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def analyze(description):
+    """Reachability for a LevelDescription, cached by level_hash()."""
+    key = level_hash(description)
+    result = _cache.get(key)
+    if result is None:
+        result = _cache[key] = _analyze(description)
+    return result
+
+
+def _analyze(description):
+    surfaces = _surfaces(description)
+    max_x = description.width - PLAYER_WIDTH
+
+    # The player drops from the spawn point onto the highest surface under it
+    spawn_x, spawn_y = SPAWN
+    below = [i for i, s in enumerate(surfaces)
+             if s.top >= spawn_y + PLAYER_HEIGHT and any(low <= spawn_x <= high for low, high in s.spans)]
+    # Surfaces sorted by left edge, so each jump only looks at those in reach
+    order = sorted(range(len(surfaces)), key=lambda i: surfaces[i].low)
+    lows = [surfaces[i].low for i in order]
+    widest = max(s.high - s.low for s in surfaces)
+
+    reached = set()
+    if below:
+        start = min(below, key=lambda i: surfaces[i].top)
+        reached.add(start)
+        frontier = [start]
+        while frontier:
+            source = surfaces[frontier.pop()]
+            first = bisect_left(lows, source.low - MAX_REACH - widest)
+            last = bisect_right(lows, source.high + MAX_REACH)
+            for i in order[first:last]:
+                if i not in reached and _lands(source, surfaces[i], max_x):
+                    reached.add(i)
+                    frontier.append(i)
+
+    zing_x, _ = description.lord_zing
+    boss_center = zing_x + BOSS_SIZE[0] // 2
+    boss = any(_gap(surfaces[i].low + PLAYER_WIDTH // 2, surfaces[i].high + PLAYER_WIDTH // 2,
+                    boss_center - BOSS_SWAY, boss_center + BOSS_SWAY) < ATTACK_RANGE
+               for i in reached)
+    friend = any(_touches(surfaces[i], description.friend + FRIEND_SIZE, max_x) for i in reached)
+    return Reachability(surfaces, reached, boss, friend)
+
+
+def _surfaces(description):
+    surfaces = [Surface(i, "platforms", y, height, [x], width)
+                for i, (x, y, width, height) in enumerate(description.platforms)]
+    for i, params in enumerate(description.moving_platforms):
+        x, y, width, height, speed, direction, range_limit = params
+        mover = MovingPlatform(x, y, width, height, speed=speed, direction=direction, range_limit=range_limit)
+        mover.motion_at(0)
+        path = mover.path
+        if path.cycle_start is None:
+            end = path.starts[-1] + 1
+        else:
+            end = path.cycle_start + path.cycle_frames
+        frames = set(path.starts)
+        frames.update(range(0, end, max(1, end // MOVER_SAMPLES)))
+        lefts = sorted({mover.motion_at(frame)[0] for frame in frames})
+        surfaces.append(Surface(i, "moving_platforms", y, height, lefts, width))
+    return surfaces
+
+
+def _lands(source, target, max_x):
+    # Whether some jump from source comes down on target at one of its positions
+    reach = landing_reach(source.top - target.top, target.height)
+    if reach is None:
+        return False
+    low = max(source.low - reach, 0)
+    high = min(source.high + reach, max_x)
+    return any(target_low <= high and low <= target_high for target_low, target_high in target.spans)
+
+
+def _gap(low, high, other_low, other_high):
+    # Distance between two intervals, 0 if they overlap
+    return max(other_low - high, low - other_high, 0)
+
+
+def _touches(surface, rect, max_x):
+    # Whether a jump from the surface passes through rect
+    rect_x, rect_y, width, height = rect
+    for x, rise, falling in ARC:
+        if falling and rise < 0:
+            break
+        top = surface.top - rise - PLAYER_HEIGHT
+        if top < rect_y + height and top + PLAYER_HEIGHT > rect_y:
+            low = max(surface.low - x, 0)
+            high = min(surface.high + x, max_x)
+            if low < rect_x + width and high + PLAYER_WIDTH > rect_x:
+                return True
+    return False
+
+
+def analyze_file(path):
+    return path, analyze(load_level(path))
+
+
+def analyze_files(paths, processes=None):
+    """[(path, Reachability)] for many level files, analyzed in a process pool."""
+    with mp.Pool(processes) as pool:
+        return pool.map(analyze_file, paths)
+
+
+def analyze_levels(descriptions, processes=None):
+    """[Reachability] for many LevelDescriptions, analyzed in a process pool.
+
+    The results are added to this process's cache as well.
+    """
+    pending = {}
+    for description in descriptions:
+        key = level_hash(description)
+        if key not in _cache:
+            pending.setdefault(key, description)
+    if pending:
+        with mp.Pool(processes) as pool:
+            _cache.update(zip(pending, pool.map(_analyze, pending.values())))
+    return [_cache[level_hash(description)] for description in descriptions]
+
+
+def main(argv):
+    paths = argv or [level_path(number) for number in range(1, level_count() + 1)]
+    failed = 0
+    for path, result in analyze_files(paths):
+        status = "ok" if result.completable else "NOT COMPLETABLE"
+        print(f"{path}: {status} ({len(result.reached)}/{len(result.surfaces)} surfaces reachable,"
+              f" boss {'reachable' if result.boss else 'unreachable'},"
+              f" friend {'reachable' if result.friend else 'unreachable'})")
+        failed += not result.completable
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))